@@ -5,6 +5,102 @@ Vypocty k delici hlave
 
 @author: david
 '''
+import copy
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+
+# jeden plan deleni: kotouc (nazev atributu), kruh der, cele otacky klikou a diry navic na krok
+PlanDeleni = namedtuple('PlanDeleni', ['kotouc', 'kruh', 'otacky', 'diry'])
+# plan diferencialniho deleni: kotouc, kruh, otacky a diry nastavuji pomocne deleni, kotouc se
+# pri tom otaci pres vymenna kola (hnaci na vretenu, hnana na hridelce kotouce)
+PlanDiferencialni = namedtuple('PlanDiferencialni', ['deleni', 'pomocne_deleni', 'kotouc', 'kruh', 'otacky',
+                                                     'diry', 'hnaci', 'hnana', 'smer', 'mezikola'])
+# plan uhloveho deleni: uhel [stupne], kotouc, kruh, otacky, diry a chyba nastaveni [uhlove vteriny]
+PlanUhlovy = namedtuple('PlanUhlovy', ['uhel', 'kotouc', 'kruh', 'otacky', 'diry', 'chyba'])
+# navrh vlastnich kotoucu: tuple kotoucu (tuple poctu der jako DeliciHlava.diry) a nepokrytelna deleni
+NavrhKotoucu = namedtuple('NavrhKotoucu', ['kotouce', 'nepokryta'])
+# jeden krok deleni: otacky a diry kroku, rozevreni nuzek (pocet der vcetne vychozi), poloha klikou
+# od zacatku (cele otacky a diry) a kumulovana uhlova chyba obrobku [uhlove vteriny]
+KrokDeleni = namedtuple('KrokDeleni', ['krok', 'otacky', 'diry', 'rozevreni', 'poloha_otacky', 'poloha_diry', 'chyba'])
+
+VTERIN_NA_OTACKU = 1296000     # 360 * 60 * 60
+
+
+def _zlomek(cislo):
+    """Zlomek z cisla tak, jak je zapsane - 40.1 je 401/10, ne presna binarni hodnota floatu."""
+    return Fraction(cislo) if isinstance(cislo, (int, Fraction)) else Fraction(str(cislo))
+
+
+@lru_cache(maxsize=1024)
+def _rozklad(cislo):
+    """Rozlozi cele kladne cislo na prvocinitele pokusnym delenim do odmocniny.
+    :param cislo cele kladne cislo
+    :return tuple dvojic (prvocislo, exponent) serazenych vzestupne"""
+    cinitele = []
+    delitel = 2
+    while delitel * delitel <= cislo:
+        if cislo % delitel == 0:
+            exponent = 0
+            while cislo % delitel == 0:
+                cislo //= delitel
+                exponent += 1
+            cinitele.append((delitel, exponent))
+        delitel += 1 if delitel == 2 else 2
+    if cislo > 1:
+        cinitele.append((cislo, 1))
+    return tuple(cinitele)
+
+
+@lru_cache(maxsize=1024)
+def _delitele(cislo):
+    """Vrati vsechny delitele cisla vzestupne, sestavene z jeho prvociselneho rozkladu.
+    :param cislo cele kladne cislo
+    :return tuple delitelu"""
+    delitele = [1]
+    for prvocislo, exponent in _rozklad(cislo):
+        mocniny = [prvocislo ** e for e in range(1, exponent + 1)]
+        delitele += [d * m for d in delitele for m in mocniny]
+    return tuple(sorted(delitele))
+
+
+def _nejlepsi_zlomek(citatel, jmenovatel, max_jmenovatel):
+    """Nejlepsi racionalni aproximace citatel / jmenovatel se jmenovatelem nejvyse max_jmenovatel
+    (sblizene a polosblizene zlomky retezoveho zlomku, stejne jako Fraction.limit_denominator).
+    :param citatel nezaporne cele cislo
+    :param jmenovatel kladne cele cislo
+    :return dvojice (p, q)"""
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    n, d = citatel, jmenovatel
+    while True:
+        a = n // d
+        q2 = q0 + a * q1
+        if q2 > max_jmenovatel:
+            break
+        p0, q0, p1, q1 = p1, q1, p0 + a * p1, q2
+        n, d = d, n - a * d
+        if d == 0:
+            return p1, q1
+    k = (max_jmenovatel - q0) // q1
+    pb, qb = p0 + k * p1, q0 + k * q1
+    # blizsi z polosblizeneho pb/qb a sblizeneho p1/q1
+    if abs(pb * jmenovatel - citatel * qb) * q1 < abs(p1 * jmenovatel - citatel * q1) * qb:
+        return pb, qb
+    return p1, q1
+
+
+@lru_cache(maxsize=16)
+def _prevody_kol(kola):
+    """Vsechny jednoduche prevody z dane sady vymennych kol.
+    :param kola tuple poctu zubu (kola se mohou opakovat)
+    :return slovnik prevod (Fraction hnaci/hnana) -> list dvojic indexu (hnaci, hnana)"""
+    prevody = {}
+    for i, hnaci in enumerate(kola):
+        for j, hnana in enumerate(kola):
+            if i != j:
+                prevody.setdefault(Fraction(hnaci, hnana), []).append((i, j))
+    return prevody
+
 
 
 class DeliciHlava:
@@ -17,40 +113,380 @@ class DeliciHlava:
         self.diry2 = (46, 47, 49, 51, 53, 54, 57, 58, 59, 62, 66)
         self.diry_cina_1 = (61, 55, 47, 41, 33, 30, 27, 19)
         self.diry_cina_2 = (59, 51, 43, 39, 31, 28, 25, 23)
+        self.kola = (24, 24, 28, 32, 40, 44, 48, 56, 64, 72, 86, 100)   # vymenna kola Brown & Sharpe
+
+    def kotouce(self):
+        """Vrati dostupne delici kotouce jako slovnik nazev -> tuple poctu der v kruzich."""
+        return {'diry': self.diry, 'diry2': self.diry2,
+                'diry_cina_1': self.diry_cina_1, 'diry_cina_2': self.diry_cina_2}
+
+    def _krok_klikou(self, deleni, use_table=False):
+        """Presny pocet otacek klikou na jeden krok deleni jako zlomek."""
+        active_ratio = self.ratio_table if use_table else self.ratio
+        return _zlomek(active_ratio) / _zlomek(deleni)
 
     def prozkoumej_deleni(self, pocet_der):
         """Vypocte z pomeru delici hlavy a z poctu der v kotouci dosazitelna celociselna deleni.
         :param pocet_der - pocet der v kotouci
-        :return tuple celociselnych deleni"""
-        max_num = pocet_der * self.ratio
-        out = []
-        for iterator in range(1, int(max_num)):
-            num = max_num / iterator
-            if num.is_integer():
-                out.append(int(num))
-        return tuple(out)
+        :return tuple celociselnych deleni (sestupne)"""
+        max_num = _zlomek(pocet_der) * _zlomek(self.ratio)
+        if max_num.denominator != 1 or max_num < 2:
+            return ()
+        # deleni jsou delitele max_num vetsi nez 1, sestupne jako u puvodni smycky max_num / i
+        return tuple(reversed(_delitele(max_num.numerator)[1:]))
 
     def vypocti_pocet_der(self, deleni, use_table=False):
         """Vypocte z pozadovaneho deleni pri danem pomeru hlavy pocet der.
         :param deleni pozadovane deleni
         :param use_table pokud True, pouzije ratio_table misto ratio
         :return pocet der"""
-        # Vybere spravny pomer podle parametru
-        active_ratio = self.ratio_table if use_table else self.ratio
-        base = active_ratio / deleni
-        prubezne = 1
-        while True:
-            check_num = base * prubezne
-            if check_num.is_integer():
-                break
-            else:
-                prubezne += 1
-            if prubezne > 150:
-                print(f"Too many holes required (>{150}) for division {deleni}, aborting")
-                prubezne = 0
-                break
+        # nejmensi pocet der je jmenovatel zkraceneho zlomku ratio / deleni
+        prubezne = self._krok_klikou(deleni, use_table).denominator
+        if prubezne > 150:
+            print(f"Too many holes required (>{150}) for division {deleni}, aborting")
+            prubezne = 0
         return prubezne
 
+    def planuj_deleni(self, deleni, use_table=False):
+        """Najde na dostupnych kotoucich vsechny kruhy, kterymi lze deleni presne nastavit.
+        :param deleni pozadovane deleni
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :return tuple PlanDeleni (kotouc, kruh, otacky, diry)"""
+        krok = self._krok_klikou(deleni, use_table)
+        plany = []
+        for kotouc, kruhy in self.kotouce().items():
+            for kruh in kruhy:
+                if kruh % krok.denominator == 0:
+                    otacky, diry = divmod(krok.numerator * (kruh // krok.denominator), kruh)
+                    plany.append(PlanDeleni(kotouc, kruh, otacky, diry))
+        return tuple(plany)
+
+    def planuj_vice(self, deleni_seznam, use_table=False):
+        """Naplanuje vice deleni najednou.
+        :param deleni_seznam iterovatelna deleni
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :return slovnik deleni -> tuple PlanDeleni"""
+        return {deleni: self.planuj_deleni(deleni, use_table) for deleni in deleni_seznam}
+
+    def _najdi_kola(self, prevod, slozene=True):
+        """Najde vymenna kola pro presny prevod, nejdrive jednoduchy, pak slozeny (dva pary).
+        Slozeny prevod hleda setkanim uprostred: ke kazdemu paru dohleda ve slovniku prevodu
+        druhy par, ktery doplni pozadovany prevod.
+        :return (hnaci, hnana) jako tuple poctu zubu, nebo None"""
+        prevody = _prevody_kol(tuple(self.kola))
+        if prevod in prevody:
+            i, j = prevody[prevod][0]
+            return (self.kola[i],), (self.kola[j],)
+        if not slozene:
+            return None
+        for prvni, pary in prevody.items():
+            for i, j in pary:
+                for k, m in prevody.get(prevod / prvni, ()):
+                    if len({i, j, k, m}) == 4:
+                        return (self.kola[i], self.kola[k]), (self.kola[j], self.kola[m])
+        return None
+
+    def diferencialni_deleni(self, deleni, use_table=False, max_odchylka=30):
+        """Navrhne diferencialni deleni pro deleni, ktere nelze nastavit primo (napr. 127).
+        Pomocne deleni A se nastavuje klikou na kotouci, kotouc se pritom otaci pres vymenna
+        kola s prevodem ratio * (A - deleni) / A. Pomocna deleni se zkousi od nejblizsiho,
+        jednoduchy prevod ukonci hledani, slozeny se pamatuje jako zalozni reseni.
+        :param deleni pozadovane deleni
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :param max_odchylka nejvetsi zkousena vzdalenost pomocneho deleni od pozadovaneho
+        :return PlanDiferencialni, nebo None pokud reseni neexistuje"""
+        active_ratio = _zlomek(self.ratio_table if use_table else self.ratio)
+        zalozni = None
+        for odchylka in range(1, max_odchylka + 1):
+            for pomocne in (deleni + odchylka, deleni - odchylka):
+                if pomocne < 2:
+                    continue
+                plany = self.planuj_deleni(pomocne, use_table)
+                if not plany:
+                    continue
+                # po nalezeni slozeneho prevodu uz hledame jen jednoduchy
+                kola = self._najdi_kola(abs(active_ratio * (pomocne - deleni) / pomocne), zalozni is None)
+                if kola is None:
+                    continue
+                hnaci, hnana = kola
+                souhlasny = pomocne > deleni
+                if len(hnaci) == 1:
+                    mezikola = 1 if souhlasny else 2
+                else:
+                    mezikola = 0 if souhlasny else 1
+                plan = PlanDiferencialni(deleni, pomocne, plany[0].kotouc, plany[0].kruh, plany[0].otacky,
+                                         plany[0].diry, hnaci, hnana,
+                                         'souhlasny' if souhlasny else 'opacny', mezikola)
+                if len(hnaci) == 1:
+                    return plan
+                zalozni = plan
+        return zalozni
+
+    def _uhlove_kruhy(self):
+        """Kruhy pro uhlove deleni: list (kotouc, kruh) a slovnik jmenovatel -> (kotouc, kruh)
+        pro vsechny jmenovatele, ktere nektery kruh presne nastavi (delitele poctu der)."""
+        kruhy = [(kotouc, kruh) for kotouc, seznam in self.kotouce().items() for kruh in seznam]
+        jmenovatele = {}
+        for kotouc, kruh in kruhy:
+            for q in _delitele(kruh):
+                jmenovatele.setdefault(q, (kotouc, kruh))
+        return kruhy, jmenovatele
+
+    def _uhlovy_plan(self, vteriny, active_ratio, kruhy, jmenovatele):
+        """Nejblizsi nastaveni uhlu zadaneho v uhlovych vterinach (Fraction).
+        Otacky klikou se nejdrive aproximuji retezovym zlomkem se jmenovatelem do nejvetsiho
+        kruhu. Pokud jmenovatel takove aproximace deli nektery kruh, je to nejlepsi mozne
+        nastaveni, jinak se projdou vsechny kruhy. Pocita se jen v celych cislech."""
+        otacky_klikou = vteriny * active_ratio / VTERIN_NA_OTACKU
+        citatel, jmenovatel = abs(otacky_klikou.numerator), otacky_klikou.denominator
+        p, q = _nejlepsi_zlomek(citatel, jmenovatel, max(kruh for _, kruh in kruhy))
+        if q in jmenovatele:
+            kotouc, kruh = jmenovatele[q]
+            diry_celkem = p * (kruh // q)
+        else:
+            kotouc = kruh = diry_celkem = chyba = None
+            for k, c in kruhy:
+                n = citatel * c
+                d = (2 * n + jmenovatel) // (2 * jmenovatel)     # zaokrouhleni n / jmenovatel
+                e = abs(d * jmenovatel - n)
+                if kruh is None or e * kruh < chyba * c:
+                    kotouc, kruh, diry_celkem, chyba = k, c, d, e
+        otacky, diry = divmod(diry_celkem, kruh)
+        chyba = (diry_celkem * jmenovatel - citatel * kruh) * VTERIN_NA_OTACKU / (kruh * jmenovatel * active_ratio)
+        if otacky_klikou < 0:
+            otacky, diry, chyba = -otacky, -diry, -chyba
+        return PlanUhlovy(float(vteriny / 3600), kotouc, kruh, otacky, diry, float(chyba))
+
+    def uhlove_deleni(self, stupne, minuty=0, sekundy=0, use_table=False):
+        """Prevede uhel na otacky klikou a diry na nejvhodnejsim dostupnem kruhu.
+        :param stupne, minuty, sekundy pozadovany uhel
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :return PlanUhlovy, chyba je nastaveny minus pozadovany uhel v uhlovych vterinach"""
+        active_ratio = _zlomek(self.ratio_table if use_table else self.ratio)
+        vteriny = _zlomek(stupne) * 3600 + _zlomek(minuty) * 60 + _zlomek(sekundy)
+        return self._uhlovy_plan(vteriny, active_ratio, *self._uhlove_kruhy())
+
+    def tabulka_uhlu(self, krok_vterin=60, use_table=True):
+        """Tabulka uhloveho deleni pro cely kruh 0-360 stupnu s danym krokem.
+        :param krok_vterin krok tabulky v uhlovych vterinach, standardne uhlova minuta
+        :param use_table pokud True (standardne), pouzije ratio_table otocneho stolu
+        :return tuple PlanUhlovy"""
+        active_ratio = _zlomek(self.ratio_table if use_table else self.ratio)
+        kruhy, jmenovatele = self._uhlove_kruhy()
+        krok = _zlomek(krok_vterin)
+        return tuple(self._uhlovy_plan(i * krok, active_ratio, kruhy, jmenovatele)
+                     for i in range(int(VTERIN_NA_OTACKU / krok)))
+
+    def sekvence_deleni(self, deleni, use_table=False, kruh=None):
+        """Generuje postupne vsechny kroky deleni pro celou otacku obrobku.
+        Pokud deleni nelze nastavit presne, pouzije nejvetsi kruh a kazdy krok zaokrouhli
+        na nejblizsi diru vzhledem k presne poloze od zacatku, takze se chyba nescita.
+        :param deleni pozadovane deleni
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :param kruh pocet der kruhu, None = prvni presny plan, jinak nejvetsi kruh
+        :return generator KrokDeleni
+        :raises ValueError hned pri volani, pokud deleni nebo kruh neni kladne cele cislo"""
+        if int(deleni) != deleni or deleni < 1:
+            raise ValueError('division has to be a positive integer, got: {}'.format(deleni))
+        if kruh is not None and (int(kruh) != kruh or kruh < 1):
+            raise ValueError('hole circle has to be a positive integer, got: {}'.format(kruh))
+        active_ratio = _zlomek(self.ratio_table if use_table else self.ratio)
+        if kruh is None:
+            plany = self.planuj_deleni(deleni, use_table)
+            kruh = plany[0].kruh if plany else max(k for kruhy in self.kotouce().values() for k in kruhy)
+        return self._kroky_deleni(active_ratio, int(deleni), int(kruh))
+
+    @staticmethod
+    def _kroky_deleni(active_ratio, deleni, kruh):
+        krok = active_ratio / _zlomek(deleni)
+        citatel, jmenovatel = krok.numerator * kruh, krok.denominator
+        predchozi = 0
+        for i in range(1, deleni + 1):
+            poloha = (2 * i * citatel + jmenovatel) // (2 * jmenovatel)   # zaokrouhleni i * krok * kruh
+            otacky, diry = divmod(poloha - predchozi, kruh)
+            poloha_otacky, poloha_diry = divmod(poloha, kruh)
+            chyba = (poloha * jmenovatel - i * citatel) * VTERIN_NA_OTACKU / (kruh * jmenovatel * active_ratio)
+            yield KrokDeleni(i, otacky, diry, diry + 1, poloha_otacky, poloha_diry, float(chyba))
+            predchozi = poloha
+
+    def navrhni_kotouce(self, cilova_deleni, pocet_kotoucu=2, kruhu_na_kotouc=11, kandidati=range(15, 101),
+                        use_table=False, max_uzlu=200000):
+        """Navrhne nejmensi sadu kruhu der, ktera pokryje vsechna cilova deleni.
+        Kazdy kandidatni kruh ma bitovou masku pokrytych deleni (kruh pokryva deleni N, pokud je
+        nasobkem vypocti_pocet_der(N)). Reseni hladoveho algoritmu slouzi jako horni mez
+        pro presne vetveni s orezavanim, vetvi se podle deleni s nejmene kandidaty.
+        :param cilova_deleni iterovatelna pozadovana deleni
+        :param pocet_kotoucu pocet kotoucu k dispozici
+        :param kruhu_na_kotouc nejvetsi pocet kruhu na jednom kotouci
+        :param kandidati mozne pocty der v kruhu
+        :param use_table pokud True, pouzije ratio_table misto ratio
+        :param max_uzlu limit uzlu presneho hledani, pak zustane nejlepsi dosud nalezene reseni
+        :return NavrhKotoucu, kotouce jsou tuple poctu der sestupne jako DeliciHlava.diry"""
+        cilova_deleni = sorted(set(cilova_deleni))
+        kandidati = sorted(set(kandidati))
+        potrebne = [self._krok_klikou(deleni, use_table).denominator for deleni in cilova_deleni]
+        masky = {}
+        for kruh in kandidati:
+            maska = 0
+            for i, pocet in enumerate(potrebne):
+                if kruh % pocet == 0:
+                    maska |= 1 << i
+            if maska:
+                masky[kruh] = maska
+        # vyrazeni kruhu, jejichz pokryti je podmnozinou pokryti jineho kruhu
+        kruhy = [k for k in masky if not any(j != k and masky[k] | masky[j] == masky[j] and
+                                              (masky[k] != masky[j] or j < k) for j in masky)]
+        pokrytelne = 0
+        for kruh in kruhy:
+            pokrytelne |= masky[kruh]
+        nepokryta = tuple(d for i, d in enumerate(cilova_deleni) if not pokrytelne >> i & 1)
+
+        nejlepsi = []
+        zbyva = pokrytelne
+        while zbyva:
+            kruh = max(kruhy, key=lambda k: bin(masky[k] & zbyva).count('1'))
+            nejlepsi.append(kruh)
+            zbyva &= ~masky[kruh]
+
+        nejvic = max((bin(masky[k]).count('1') for k in kruhy), default=1)
+        uzly = 0
+
+        def hledej(zbyva, vybrane):
+            nonlocal nejlepsi, uzly
+            if not zbyva:
+                if len(vybrane) < len(nejlepsi):
+                    nejlepsi = list(vybrane)
+                return
+            uzly += 1
+            if uzly > max_uzlu or len(vybrane) + -(-bin(zbyva).count('1') // nejvic) >= len(nejlepsi):
+                return
+            nejnizsi = zbyva & -zbyva
+            moznosti = [k for k in kruhy if masky[k] & nejnizsi]
+            # deleni s nejmene moznostmi vetvi nejmene
+            bit = nejnizsi
+            while bit <= zbyva:
+                if zbyva & bit:
+                    m = [k for k in kruhy if masky[k] & bit]
+                    if len(m) < len(moznosti):
+                        moznosti = m
+                        if len(m) == 1:
+                            break
+                bit <<= 1
+            moznosti.sort(key=lambda k: -bin(masky[k] & zbyva).count('1'))
+            for kruh in moznosti:
+                vybrane.append(kruh)
+                hledej(zbyva & ~masky[kruh], vybrane)
+                vybrane.pop()
+
+        hledej(pokrytelne, [])
+        if len(nejlepsi) > pocet_kotoucu * kruhu_na_kotouc:
+            raise ValueError('{} circles required, only {} fit on {} plates'.format(
+                len(nejlepsi), pocet_kotoucu * kruhu_na_kotouc, pocet_kotoucu))
+        nejlepsi.sort(reverse=True)
+        kotouce = tuple(tuple(nejlepsi[i:i + kruhu_na_kotouc]) for i in range(0, len(nejlepsi), kruhu_na_kotouc))
+        return NavrhKotoucu(kotouce, nepokryta)
+
+    def diferencialni_vice(self, deleni_seznam, use_table=False):
+        """Diferencialni deleni pro vice deleni najednou.
+        :return slovnik deleni -> PlanDiferencialni nebo None"""
+        return {deleni: self.diferencialni_deleni(deleni, use_table) for deleni in deleni_seznam}
+
+
+class IndexDeleni:
+    """Predpocitany index deleni pro vsechny kruhy dostupnych kotoucu a zadane pomery.
+    Pro kazdy pomer a kruh drzi bitovou mnozinu dosazitelnych deleni 1..max_deleni (bit N
+    je nastaven, pokud kruh deleni N presne nastavi) a pro kazde deleni hotove plany."""
+
+    def __init__(self, hlava=None, pomery=None, max_deleni=1000):
+        self.hlava = hlava if hlava is not None else DeliciHlava()
+        if pomery is None:
+            pomery = (self.hlava.ratio, self.hlava.ratio_table)
+        self.max_deleni = max_deleni
+        self._bity = {}     # (pomer, kotouc, kruh) -> int s bity dosazitelnych deleni
+        self._plany = {}    # pomer -> {deleni: tuple PlanDeleni}
+        self._deleni = {}   # (pomer, kruh) -> tuple vsech deleni instalovaneho kruhu (jako prozkoumej_deleni)
+        for pomer in pomery:
+            self._postav(pomer)
+
+    def _postav(self, pomer):
+        plany = {}
+        for kotouc, kruhy in self.hlava.kotouce().items():
+            for kruh in kruhy:
+                celkem = _zlomek(pomer) * kruh
+                bity = 0
+                self._deleni[(pomer, kruh)] = ()
+                if celkem.denominator == 1:
+                    delitele = _delitele(celkem.numerator)
+                    self._deleni[(pomer, kruh)] = tuple(reversed(delitele[1:]))
+                    for deleni in delitele:
+                        if deleni > self.max_deleni:
+                            break
+                        bity |= 1 << deleni
+                        otacky, diry = divmod(celkem.numerator // deleni, kruh)
+                        plany.setdefault(deleni, []).append(PlanDeleni(kotouc, kruh, otacky, diry))
+                self._bity[(pomer, kotouc, kruh)] = bity
+        self._plany[pomer] = {deleni: tuple(p) for deleni, p in plany.items()}
+
+    def plany(self, deleni, pomer):
+        """Vrati plany deleni pro dany pomer, nad max_deleni je dopocita.
+        :return tuple PlanDeleni"""
+        if pomer not in self._plany:
+            self._postav(pomer)
+        if deleni > self.max_deleni:
+            hlava = copy.copy(self.hlava)
+            hlava.ratio = pomer
+            return hlava.planuj_deleni(deleni)
+        return self._plany[pomer].get(deleni, ())
+
+    def deleni_pro_kruh(self, kruh, pomer):
+        """Vsechna dosazitelna deleni pro kruh, viz DeliciHlava.prozkoumej_deleni. Kruhy kotoucu jsou
+        predpocitane v indexu, jine pocty der se spocitaji primo a neukladaji (index je sdileny)."""
+        deleni = self._deleni.get((pomer, kruh))
+        if deleni is None:
+            deleni = DeliciHlava(pomer).prozkoumej_deleni(kruh)
+        return deleni
+
+    def bity(self, pomer, kotouce=None):
+        """Sjednoceni bitovych mnozin vsech kruhu na vybranych kotoucich.
+        :param kotouce nazvy kotoucu (viz DeliciHlava.kotouce), None = vsechny
+        :return int, bit N je nastaven pro dosazitelne deleni N"""
+        if pomer not in self._plany:
+            self._postav(pomer)
+        bity = 0
+        for (p, kotouc, kruh), b in self._bity.items():
+            if p == pomer and (kotouce is None or kotouc in kotouce):
+                bity |= b
+        return bity
+
+    def dosazitelna(self, pomer, kotouce=None):
+        """Vrati tuple deleni 1..max_deleni dosazitelnych na vybranych kotoucich."""
+        return _bity_na_tuple(self.bity(pomer, kotouce))
+
+    def nedosazitelna(self, pomer, kotouce=None):
+        """Vrati tuple deleni 1..max_deleni, ktera na vybranych kotoucich nastavit nelze."""
+        vse = (1 << (self.max_deleni + 1)) - 2
+        return _bity_na_tuple(vse & ~self.bity(pomer, kotouce))
+
+    def spolecna(self, pomer, kotouce_a, kotouce_b):
+        """Vrati tuple deleni dosazitelnych jak na kotoucich kotouce_a, tak na kotouce_b."""
+        return _bity_na_tuple(self.bity(pomer, kotouce_a) & self.bity(pomer, kotouce_b))
+
+
+def _bity_na_tuple(bity):
+    """Prevede bitovou mnozinu na vzestupny tuple cisel nastavenych bitu."""
+    out = []
+    while bity:
+        nejnizsi = bity & -bity
+        out.append(nejnizsi.bit_length() - 1)
+        bity ^= nejnizsi
+    return tuple(out)
+
+
+@lru_cache(maxsize=32)
+def ziskej_index(ratio=40.0, ratio_table=120, max_deleni=1000):
+    """Vrati sdileny IndexDeleni pro standardni kotouce, postaveny jen pri prvnim volani."""
+    return IndexDeleni(DeliciHlava(ratio, ratio_table), max_deleni=max_deleni)
+
 
 # Zachovani zpetne kompatibility
 def prozkoumej_deleni(pocet_der, ratio=40.0):
@@ -80,5 +516,7 @@ if __name__ == '__main__':
         if pocetDer > 0:
             print('pro deleni {} je nutne mit pri pomeru hlavy {} obsazenych {} der v kotouci, '
                   'nebo celociselne nasobky tohoto cisla.'.format(pozadDeleni, hlava.ratio, pocetDer))
+            for plan in hlava.planuj_deleni(pozadDeleni):
+                print('  kotouc {}, kruh {}: {} otacek + {} der'.format(*plan))
         else:
             print(f"Cannot calculate holes for division {pozadDeleni} with ratio {hlava.ratio}")
\ No newline at end of file
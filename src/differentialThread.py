@@ -8,6 +8,317 @@ viz https://en.wikipedia.org/wiki/Differential_screw
 
 @author: David Potucek
 """
+import heapq
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:     # NumPy je volitelny, bez nej se pole pocitaji po prvcich
+    np = None
+
+# radek planu diferencialniho zavitu pro jeden pozadovany pohyb, delky jsou v jednotkach pohybu
+TravelPlan = namedtuple('TravelPlan', ['pohyb', 'hruba_matka', 'jemna_matka', 'posuv_na_otacku', 'otacky',
+                                       'delka_hrubeho', 'delka_jemneho', 'max_vzdalenost', 'min_vzdalenost'])
+
+# slozeny zavit: prvky jsou trojice (stoupani, pocet chodu, znamenko), efektivni stoupani a odchylka
+CompoundThread = namedtuple('CompoundThread', ['prvky', 'efektivni_stoupani', 'odchylka'])
+
+
+def calculate_diff_thread_array(stoupani_hrube, stoupani_jemne):
+    """Efektivni stoupani pro cela pole dvojic najednou. Neplatne dvojice (nulove nebo stejne
+    stoupani) jsou NaN misto vyjimky. S NumPy se pole rozsiruji (broadcast), takze
+    calculate_diff_thread_array(v[:, None], v[None, :]) je cela matice inventare jednim vyrazem.
+    Bez NumPy prijima cisla nebo stejne dlouhe posloupnosti a vraci list.
+    :param stoupani_hrube: pitches of thread 1
+    :param stoupani_jemne: pitches of thread 2
+    :return: effective pitches, NaN for invalid pairs"""
+    if np is not None:
+        hrube = np.asarray(stoupani_hrube, dtype=float)
+        jemne = np.asarray(stoupani_jemne, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pe = np.abs(1 / ((1 / hrube) - (1 / jemne)))
+        return np.where((hrube == 0) | (jemne == 0) | (hrube == jemne), np.nan, pe)
+    skalar = (int, float)
+    if isinstance(stoupani_hrube, skalar) and isinstance(stoupani_jemne, skalar):
+        return _diff_thread_or_nan(stoupani_hrube, stoupani_jemne)
+    if isinstance(stoupani_hrube, skalar):
+        stoupani_hrube = [stoupani_hrube] * len(stoupani_jemne)
+    if isinstance(stoupani_jemne, skalar):
+        stoupani_jemne = [stoupani_jemne] * len(stoupani_hrube)
+    if len(stoupani_hrube) != len(stoupani_jemne):
+        raise ValueError('pitch arrays differ in length')
+    return [_diff_thread_or_nan(h, j) for h, j in zip(stoupani_hrube, stoupani_jemne)]
+
+
+def _diff_thread_or_nan(hruby, jemny):
+    if hruby == 0 or jemny == 0 or hruby == jemny:
+        return float('nan')
+    return abs(1 / ((1 / hruby) - (1 / jemny)))
+
+
+def pitch_matrix(values):
+    """Matice efektivnich stoupani inventare, prvek [i][j] je dvojice hruby values[i], jemny values[j].
+    :return NumPy matice, bez NumPy list listu; neplatne dvojice jsou NaN"""
+    if np is not None:
+        v = np.asarray(values, dtype=float)
+        return calculate_diff_thread_array(v[:, None], v[None, :])
+    return [calculate_diff_thread_array(hruby, list(values)) for hruby in values]
+
+
+class PitchPairTable:
+    """Serazena tabulka vsech platnych dvojic zavitu jednoho inventare stoupani.
+    Kazda polozka je (efektivni stoupani, poradi, hruby, jemny), kde poradi je poradi dvojice
+    v puvodni dvojite smycce _combine_variants - podle nej se rozhoduji shody stejne jako driv."""
+
+    def __init__(self, values):
+        self.values = tuple(values)
+        if np is not None and self.values:
+            # radky matice jsou hrube zavity v poradi reversed(values), jako v puvodni smycce
+            hrube = np.asarray(self.values[::-1], dtype=float)[:, None]
+            jemne = np.asarray(self.values, dtype=float)[None, :]
+            pe = calculate_diff_thread_array(hrube, jemne)
+            platne = (hrube > jemne) & ~np.isnan(pe)
+            pe = pe[platne]
+            hrube = np.broadcast_to(hrube, platne.shape)[platne]
+            jemne = np.broadcast_to(jemne, platne.shape)[platne]
+            poradi = np.arange(len(pe))
+            serazeno = np.lexsort((poradi, pe))
+            pairs = list(zip(pe[serazeno].tolist(), poradi[serazeno].tolist(),
+                             hrube[serazeno].tolist(), jemne[serazeno].tolist()))
+        else:
+            pairs = []
+            for coarse in reversed(self.values):
+                for fine, pe in zip(self.values, calculate_diff_thread_array(coarse, self.values)):
+                    if coarse > fine and pe == pe:
+                        pairs.append((pe, len(pairs), coarse, fine))
+            pairs.sort()
+        self.pairs = tuple(pairs)
+        self.pitches = tuple(p[0] for p in pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def nearest(self, cislo, limit=3e6):
+        """Vrati kombinaci (hruby, jemny, efektivni stoupani) nejblizsi k cislo v O(log n).
+        Pri shode vzdalenosti vyhrava dvojice pozdejsi v poradi puvodni smycky.
+        :param cislo pozadovane stoupani
+        :param limit vetsi odchylka nez limit se nebere (jako puvodni best = 3e6)
+        :return tuple, nebo [] pokud zadna kombinace nevyhovuje"""
+        i = bisect_left(self.pitches, cislo)
+        kandidati = [abs(cislo - self.pitches[j]) for j in (i - 1, i) if 0 <= j < len(self.pitches)]
+        if not kandidati or min(kandidati) > limit:
+            return []
+        best = min(kandidati)
+        vybrana = None
+        j = i - 1
+        while j >= 0 and abs(cislo - self.pitches[j]) == best:
+            if vybrana is None or self.pairs[j][1] > vybrana[1]:
+                vybrana = self.pairs[j]
+            j -= 1
+        j = i
+        while j < len(self.pitches) and abs(cislo - self.pitches[j]) == best:
+            if vybrana is None or self.pairs[j][1] > vybrana[1]:
+                vybrana = self.pairs[j]
+            j += 1
+        pe, _, coarse, fine = vybrana
+        return coarse, fine, pe
+
+    def k_nearest(self, cislo, k):
+        """Vrati k kombinaci nejblizsich k cislo, serazenych podle odchylky (shody jako nearest).
+        Od mista pulleni se rozsiruje doleva i doprava, halda drzi jen cela obou front,
+        takze cena je O(log n + k log k) nezavisle na poctu vsech dvojic.
+        :return list trojic (hruby, jemny, efektivni stoupani)"""
+        i = bisect_left(self.pitches, cislo)
+        halda = []
+        for fronta in (self._doleva(i - 1), self._doprava(i)):
+            self._posun(halda, cislo, fronta)
+        vysledek = []
+        while halda and len(vysledek) < k:
+            _, _, j, fronta = heapq.heappop(halda)
+            pe, _, coarse, fine = self.pairs[j]
+            vysledek.append((coarse, fine, pe))
+            self._posun(halda, cislo, fronta)
+        return vysledek
+
+    def _posun(self, halda, cislo, fronta):
+        j = next(fronta, None)
+        if j is not None:
+            heapq.heappush(halda, (abs(cislo - self.pitches[j]), -self.pairs[j][1], j, fronta))
+
+    def _doleva(self, j):
+        # pri stejnem stoupani jde poradi sestupne uz samo (dvojice jsou serazene podle (stoupani, poradi))
+        while j >= 0:
+            yield j
+            j -= 1
+
+    def _doprava(self, j):
+        # skupinu stejnych stoupani projde pozpatku, aby i zde vyhravalo pozdejsi poradi jako v nearest
+        while j < len(self.pitches):
+            konec = bisect_right(self.pitches, self.pitches[j], j)
+            yield from range(konec - 1, j - 1, -1)
+            j = konec
+
+    def within(self, cislo, tolerance):
+        """Vrati vsechny kombinace s efektivnim stoupanim v intervalu cislo +- tolerance,
+        serazene podle odchylky.
+        :return list trojic (hruby, jemny, efektivni stoupani)"""
+        od = bisect_left(self.pitches, cislo - tolerance)
+        do = bisect_right(self.pitches, cislo + tolerance)
+        pasmo = sorted(self.pairs[od:do], key=lambda p: (abs(cislo - p[0]), -p[1]))
+        return [(coarse, fine, pe) for pe, _, coarse, fine in pasmo]
+
+
+class CompoundTable:
+    """Hledani slozenych a vicechodych diferencialnich zavitu setkanim uprostred.
+    Stoupani v se bere stejne jako v calculate_diff_thread, tj. posuv za otacku je 1/v,
+    u zavitu s n chody n/v. Vysledny posuv je soucet posuvu prvku se znamenky a efektivni
+    stoupani je jeho prevracena hodnota. Vsechny soucty dvou prvku se vsemi znamenky se
+    jednou seradi, treti prvek se k nim dohleda pulenim intervalu - O(n^2 log n) misto n^3."""
+
+    def __init__(self, values, max_starts=3):
+        self.values = tuple(values)
+        self.max_starts = max_starts
+        self.elements = tuple((v, n, n / v) for v in dict.fromkeys(self.values) if v
+                              for n in range(1, max_starts + 1))
+        sums = []
+        for i, (va, _, a) in enumerate(self.elements):
+            for j in range(i + 1, len(self.elements)):
+                vb, _, b = self.elements[j]
+                if va == vb:
+                    continue
+                for sa, sb in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+                    sums.append((sa * a + sb * b, i, sa, j, sb))
+        sums.sort()
+        self.sums = tuple(sums)
+        self.keys = tuple(s[0] for s in sums)
+
+    def _compound(self, cislo, prvky):
+        posuv = abs(sum(znamenko * self.elements[i][2] for i, znamenko in prvky))
+        if posuv == 0:
+            return None
+        pe = 1 / posuv
+        return CompoundThread(tuple((self.elements[i][0], self.elements[i][1], znamenko) for i, znamenko in prvky),
+                              pe, abs(cislo - pe))
+
+    def _neighbours(self, cil, skip=None):
+        """Nejblizsi platne soucty dvou prvku pod a nad cil (prvek skip se nesmi opakovat)."""
+        i = bisect_left(self.keys, cil)
+        for j, krok in ((i - 1, -1), (i, 1)):
+            while 0 <= j < len(self.sums):
+                _, a, _, b, _ = self.sums[j]
+                if skip is None or self.elements[skip][0] not in (self.elements[a][0], self.elements[b][0]):
+                    yield self.sums[j]
+                    break
+                j += krok
+
+    def search(self, cislo, prvku=3):
+        """Najde kombinaci dvou, pripadne tri prvku s efektivnim stoupanim nejblize cislo.
+        Protoze efektivni stoupani s posuvem monotonne klesa, staci pro kazdy cil posoudit
+        nejblizsi soucet pod a nad nim.
+        :param cislo pozadovane efektivni stoupani
+        :param prvku 2 pro diferencialni zavit, 3 i pro slozeny
+        :return CompoundThread, nebo None pokud zadna kombinace neexistuje"""
+        cil = 1 / cislo
+        best = None
+        for _, a, sa, b, sb in self._neighbours(cil):
+            kandidat = self._compound(cislo, ((a, sa), (b, sb)))
+            if kandidat is not None and (best is None or kandidat.odchylka < best.odchylka):
+                best = kandidat
+        if prvku < 3:
+            return best
+        for k, (_, _, posuv) in enumerate(self.elements):
+            for sk in (1, -1):
+                for _, a, sa, b, sb in self._neighbours(cil - sk * posuv, k):
+                    kandidat = self._compound(cislo, ((a, sa), (b, sb), (k, sk)))
+                    if kandidat is not None and (best is None or kandidat.odchylka < best.odchylka):
+                        best = kandidat
+        return best
+
+
+@lru_cache(maxsize=8)
+def compound_table(values, max_starts=3):
+    """Vrati CompoundTable pro inventar stoupani, postavenou jen jednou pro kazdy inventar.
+    :param values tuple stoupani
+    :param max_starts nejvetsi pocet chodu zavitu"""
+    return CompoundTable(values, max_starts)
+
+
+@lru_cache(maxsize=8)
+def pair_table(values):
+    """Vrati tabulku dvojic pro inventar stoupani, postavenou jen jednou pro kazdy inventar.
+    Zmeneny inventar (napr. po uprave DIFFTHRD.DAT) ma jiny klic a tabulka se postavi znovu,
+    pair_table.cache_clear() zahodi vsechny postavene tabulky.
+    :param values tuple stoupani
+    :return PitchPairTable"""
+    return PitchPairTable(values)
+
+
+def read_inventory_lines(data_file):
+    """Precte radky inventare stoupani mezi STARTOFDATA a ENDOFDATA, bez komentaru (;)
+    a prazdnych radku, ve tvaru pro DifferentialThread.parse_data."""
+    radky = []
+    uvnitr = False
+    with open(data_file) as file:
+        for line in file:
+            if line.startswith('ENDOFDATA'):
+                break
+            if line.startswith('STARTOFDATA'):
+                uvnitr = True
+                continue
+            radek = line.split(';')[0].strip()
+            if uvnitr and radek:
+                radky.append(radek + '\n')
+    return radky
+
+
+class PitchInventory:
+    """Sdileny inventar stoupani nacteny z DIFFTHRD.DAT jednou za proces.
+    Pri kazdem dotazu se porovna mtime souboru, zmeneny soubor se znovu nacte a snimek
+    (mtime, tpi, mm) se vymeni najednou, takze soucasne dotazy vidi vzdy celou starou nebo
+    celou novou verzi. Tabulky dvojic pro novou verzi se postavi ve vlakne na pozadi."""
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get(self):
+        """Vrati aktualni inventar jako (tpi, mm)."""
+        mtime = os.stat(self.data_file).st_mtime_ns
+        snapshot = self._snapshot
+        if snapshot is None or snapshot[0] != mtime:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot[0] != mtime:
+                    tpi, mm = DifferentialThread(self.data_file).parse_data(read_inventory_lines(self.data_file))
+                    snapshot = (mtime, tpi, mm)
+                    self._snapshot = snapshot
+                    threading.Thread(target=self._build_tables, args=(tpi, mm), daemon=True).start()
+        return snapshot[1], snapshot[2]
+
+    @staticmethod
+    def _build_tables(tpi, mm):
+        for values in (mm, tpi, mm + tpi):
+            pair_table(values)
+
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(data_file=None):
+    """Vrati sdileny PitchInventory pro soubor (standardne data/DIFFTHRD.DAT)."""
+    if data_file is None:
+        data_file = DifferentialThread().data_file
+    data_file = os.path.abspath(data_file)
+    with _inventories_lock:
+        if data_file not in _inventories:
+            _inventories[data_file] = PitchInventory(data_file)
+        return _inventories[data_file]
 
 
 class DifferentialThread:
@@ -15,7 +326,6 @@ class DifferentialThread:
     
     def __init__(self, data_file=None):
         if data_file is None:
-            import os
             self.data_file = os.path.join(os.path.dirname(__file__), '../data/DIFFTHRD.DAT')
         else:
             self.data_file = data_file
@@ -40,6 +350,10 @@ class DifferentialThread:
                 tpi.append(cislo)
         return tuple(tpi), tuple(mm)
 
+    def inventory(self):
+        """Vrati inventar stoupani (tpi, mm) ze sdilene cache pro self.data_file."""
+        return get_inventory(self.data_file).get()
+
     def calculate_diff_thread(self, stoupani_hrube, stoupani_jemne):
         """
         Counts real effective pitch of the thread based on 2 supplied standard pitches.
@@ -55,28 +369,63 @@ class DifferentialThread:
         return abs(Pe)
 
     def _combine_variants(self, cislo, values):
-        vysledek = []
-        best = 3e6
+        return pair_table(tuple(values)).nearest(cislo)
 
-        for coarse in reversed(values):
-            for fine in values:
-                if coarse == fine or coarse < fine:
-                    continue
-                pe = self.calculate_diff_thread(coarse, fine)
-                d = abs(cislo - pe)
-                if d <= best:
-                    vysledek = (coarse, fine, pe)
-                    best = d
-        return vysledek
-
-    def vyzkousej_kombinace(self, cislo, tpi, mm, units='mm'):
+    def _select_values(self, tpi, mm, units='mm'):
         if units == 'mm':
-            vysledek = self._combine_variants(cislo, mm)
+            return tuple(mm)
         elif units == 'in':
-            vysledek = self._combine_variants(cislo, tpi)
+            return tuple(tpi)
         else:
-            vysledek = self._combine_variants(cislo, mm + tpi)
-        return vysledek
+            return tuple(mm) + tuple(tpi)
+
+    def vyzkousej_kombinace(self, cislo, tpi, mm, units='mm'):
+        return self._combine_variants(cislo, self._select_values(tpi, mm, units))
+
+    def nejblizsi_kombinace(self, cislo, tpi, mm, units='mm', k=5):
+        """Vrati k nejblizsich kombinaci k pozadovanemu stoupani, prvni je ta z vyzkousej_kombinace.
+        :return list trojic (hruby, jemny, efektivni stoupani) serazeny podle odchylky"""
+        return pair_table(self._select_values(tpi, mm, units)).k_nearest(cislo, k)
+
+    def kombinace_v_toleranci(self, cislo, tolerance, tpi, mm, units='mm'):
+        """Vrati vsechny kombinace s efektivnim stoupanim v toleranci +- tolerance.
+        :return list trojic (hruby, jemny, efektivni stoupani) serazeny podle odchylky"""
+        return pair_table(self._select_values(tpi, mm, units)).within(cislo, tolerance)
+
+    def naplanuj_pohyb(self, hruby, jemny, pohyby, hruba_matka, jemna_matka):
+        """Spocita pro vsechny pozadovane pohyby pocet otacek, minimalni delky obou zavitu a
+        vzdalenosti matek. Kazdy sloupec se pocita jednim pruchodem pres vsechny radky.
+        :param hruby, jemny stoupani hrubeho a jemneho zavitu
+        :param pohyby pozadovany pohyb, cislo nebo posloupnost
+        :param hruba_matka, jemna_matka tloustky matek, cislo nebo posloupnost stejne delky
+        (text jako '10' je jedno cislo, ne posloupnost)
+        :return tuple TravelPlan"""
+        sloupce = [pohyby, hruba_matka, jemna_matka]
+        delka = max((len(c) for c in sloupce if not isinstance(c, (int, float, str))), default=1)
+        for i, c in enumerate(sloupce):
+            if isinstance(c, (int, float, str)):
+                sloupce[i] = (float(c),) * delka
+            elif len(c) != delka:
+                raise ValueError('expected {} values, got {}'.format(delka, len(c)))
+            else:
+                sloupce[i] = [float(v) for v in c]
+        pohyby, hruba_matka, jemna_matka = sloupce
+        pe = self.calculate_diff_thread(hruby, jemny)
+        otacky = [p * pe for p in pohyby]
+        max_vzdalenost = [o / hruby for o in otacky]
+        min_vzdalenost = [o / jemny for o in otacky]
+        delka_hrubeho = [m + v for m, v in zip(hruba_matka, min_vzdalenost)]
+        delka_jemneho = [m + v for m, v in zip(jemna_matka, max_vzdalenost)]
+        return tuple(TravelPlan(*radek) for radek in zip(pohyby, hruba_matka, jemna_matka, (1 / pe,) * delka, otacky,
+                                                          delka_hrubeho, delka_jemneho, max_vzdalenost, min_vzdalenost))
+
+    def slozeny_zavit(self, cislo, tpi, mm, units='mm', max_starts=3, prvku=3):
+        """Hleda vicechode a slozene (tri prvky) diferencialni zavity pro jemna efektivni stoupani,
+        kterych dvojice jednochodych zavitu nedosahne.
+        :param max_starts nejvetsi pocet chodu zavitu
+        :param prvku 2 pro diferencialni zavit, 3 i pro slozeny
+        :return CompoundThread (prvky jako (stoupani, chodu, znamenko)), nebo None"""
+        return compound_table(self._select_values(tpi, mm, units), max_starts).search(cislo, prvku)
 
 
 # Zachovani zpetne kompatibility
@@ -95,15 +444,11 @@ def vyzkousej_kombinace(cislo, tpi, mm, units='mm'):
 
 if __name__ == "__main__":
     import sys
-    import os
-    sys.path.append(os.path.join(os.path.dirname(__file__), '../DaPTools/src'))
-    from daptools.myTools import read_data_file
     
     dt = DifferentialThread()
     print('Program vybere kombinaci dvou dostupnych zavitu nutnuch pro pozadovane stoupani. \n'
           'viz https://en.wikipedia.org/wiki/Differential_screw')
-    lines = read_data_file(dt.data_file)
-    stoupaniTPI, stoupaniMM = dt.parse_data(lines)
+    stoupaniTPI, stoupaniMM = dt.inventory()
     print('read {} items'.format(len(stoupaniTPI) + len(stoupaniMM)))
 
     zadanyZavit = 1.8
@@ -153,10 +498,11 @@ if __name__ == "__main__":
               'jemná matka: ', fNutThic, ' ', jednotky,'\n',
               'požadovaný pohyb: ', motion, ' ', jednotky, '\n')
 
+    plan = dt.naplanuj_pohyb(cThread, fThread, motion, cNutThic, fNutThic)[0]
     print('efektivní stoupání: {:.2f} {}'.format(ePitch, jednotky))
-    print('pohyb diferenciálního závitu na jednu otáčku: {:.2f} {}'.format(1/ePitch, jednotky))
-    print('počet otáček k dosažení požadovaného posuvu: {:.2f}'.format(motion*ePitch))
-    print('minimum délky hrubého závitu: {:.2f}'.format(cNutThic + motion * ePitch/fThread))
-    print('minimum délky jemného závitu: {:.2f}'.format(fNutThic + motion * ePitch/cThread))
-    print('maximum vzdálenosti mezi matkami: {:.2f}'.format(motion * ePitch/cThread))
-    print('minimum vzdálenosti mezi matkami: {:.2f}'.format(motion * ePitch/fThread))
\ No newline at end of file
+    print('pohyb diferenciálního závitu na jednu otáčku: {:.2f} {}'.format(plan.posuv_na_otacku, jednotky))
+    print('počet otáček k dosažení požadovaného posuvu: {:.2f}'.format(plan.otacky))
+    print('minimum délky hrubého závitu: {:.2f}'.format(plan.delka_hrubeho))
+    print('minimum délky jemného závitu: {:.2f}'.format(plan.delka_jemneho))
+    print('maximum vzdálenosti mezi matkami: {:.2f}'.format(plan.max_vzdalenost))
+    print('minimum vzdálenosti mezi matkami: {:.2f}'.format(plan.min_vzdalenost))
\ No newline at end of file
@@ -7,8 +7,26 @@ Created on Oct 29, 2016
 """
 
 import os
+import csv
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from collections.abc import Sequence
+from itertools import islice
 __FILE__ = os.path.join(os.path.dirname(__file__), '../data/FINDTHRD.DAT')
 
+ThreadMatch = namedtuple('ThreadMatch', ['thread', 'vzdalenost', 'odchylka_prumeru', 'odchylka_stoupani',
+                                         'v_toleranci'])
+
 class Thread():
     """Represents thread with parameters. Works with all threads. For metric threads only see
     tappingDrills.py file, includes super class of Thread -> MetricThread.
@@ -137,37 +155,762 @@ class Thread():
         ' mm;\t' + str(self.coreDia) + ' in\n' + 'depth =\t\t\t\t' + str(self.depthMM) + ' mm;\t' + str(self.depthInch) + ' in\n')
         return str(strX)
 
+DATA_START = 'STARTOFDATA'
+DATA_END = 'ENDOFDATA'
+
+
+def _legend_and_data(lines):
+    """Splits data file stream by markers instead of fixed line numbers. Yields ('legend', line) for the
+    last block of 'CODE = text' lines above STARTOFDATA and ('data', line) for non-empty, non-comment
+    lines between STARTOFDATA and ENDOFDATA."""
+    blok = []
+    legenda = []
+    for line in lines:
+        if line.startswith(DATA_START):
+            break
+        if '=' in line:
+            blok.append(line)
+        elif blok:
+            legenda = blok + ([line] if not line.strip() else [])    # prazdny radek za blokem patri k legende
+            blok = []
+    for line in blok or legenda:
+        yield 'legend', line
+    for line in lines:
+        if line.startswith(DATA_END):
+            break
+        if line.strip() and not line.startswith(';'):
+            yield 'data', line
+
+
+def read_data_file(path):
+    """Reads thread data file, returns tuple of legend lines and tuple of data lines."""
+    dataLines = []
+    types = []
+    with open(path) as file:
+        for druh, line in _legend_and_data(file):
+            if druh == 'legend':
+                types.append(line)
+            else:
+                dataLines.append(line)
+    return tuple(types), tuple(dataLines)
+
+
+def read_legend(path):
+    """Reads only legend lines from header of data file."""
+    with open(path) as file:
+        return tuple(line for druh, line in _legend_and_data(file) if druh == 'legend')
+
+def split_line(t):
+    """Cuts fixed-width data line into name and 8 raw value strings in Thread constructor order."""
+    return (t[0:11].strip(),    # thread name
+            t[12:19].strip(),   # diameter [in]
+            t[20:27].strip(),   # diameter [mm]
+            t[28:34].strip(),   # pitch [tpi]
+            t[35:42].strip(),   # pitch [mm]
+            t[43:50],           # core diameter [in]
+            t[51:58],           # core diameter [mm]
+            t[59:66],           # depth [in]
+            t[67:72])           # depth [mm]
+
+
+def parse_number(text):
+    """Converts raw value to float, missing value gives NaN. Accepts decimal comma (11,508)."""
+    text = text.strip()
+    if text == '' or text == 'N/A':
+        return math.nan
+    return float(text.replace(',', '.'))
+
+
+def extract_thread(t):
+    """extracts information from file line and returns new Thread"""
+    n, di, dmm, ptp, pmm, cd, cmm, din, dmmd = split_line(t)
+
+    # korekce kvuli moznym chybejicim cislum
+    if di.isspace() or di == '': di = 'N/A'     # metricke zavity nemaji inch diam
+    else: di.strip()
+    if ptp.isspace() or ptp == '': ptp = 'N/A'     # metricke zavity nemaji TPI pitch
+    else: ptp.strip()
+    if cd.isspace() or cd == '': cd = 'N/A'
+    else: cd.strip()
+    if cmm.isspace() or cmm == '': cmm = 'N/A'
+    else: cmm.strip()
+    if din.isspace() or din == '': din = 'N/A'
+    else: din.strip()
+    if dmmd.isspace() or dmmd == '': dmmd = 'N/A'
+    else: dmmd.strip()
+    if (di == 'N/A'):               # metric thread
+        return Thread(n, di, float(dmm), ptp, float(pmm), cd, cmm, din, dmmd)
+    else:                           # all other threads
+        return Thread(n, float(di), float(dmm), float(ptp), float(pmm), cd, cmm, din, dmmd)
+
+
+def parse_line(t):
+    """Parses fixed-width data line into row (name, 8 floats in NUMERIC_COLUMNS order, NaN = missing)."""
+    n, *hodnoty = split_line(t)
+    return (n,) + tuple(parse_number(h) for h in hodnoty)
+
+
+class ThreadRows(Sequence):
+    """Read-only sequence of catalog threads, each Thread is built on first access to its row, so
+    a catalog loaded from compiled file never parses rows nobody asked for."""
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+        self._rows = [None] * len(catalog)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self[j] for j in range(*i.indices(len(self))))
+        thread = self._rows[i]
+        if thread is None:
+            thread = self._catalog._build_thread(i if i >= 0 else i + len(self))
+            self._rows[i] = thread
+        return thread
+
+
+class SortedIndex:
+    """Sorted index of one numeric thread attribute, missing values (N/A, NaN) are left out.
+    Queries return positions of threads in catalog order."""
+
+    def __init__(self, values):
+        dvojice = sorted((v, i) for i, v in enumerate(values) if v != 'N/A' and v == v)
+        self.values = tuple(v for v, _ in dvojice)
+        self.positions = tuple(i for _, i in dvojice)
+
+    @classmethod
+    def from_sorted(cls, values, positions):
+        """Index from already sorted sequences (e.g. memoryviews of compiled catalog)."""
+        index = cls.__new__(cls)
+        index.values = values
+        index.positions = positions
+        return index
+
+    def range(self, dolni, horni):
+        """Positions of threads with dolni <= value <= horni."""
+        zacatek = bisect_left(self.values, dolni)
+        konec = bisect_right(self.values, horni, zacatek)
+        return sorted(self.positions[zacatek:konec])
+
+    def exact(self, cislo):
+        """Positions of threads with value == cislo."""
+        return self.range(cislo, cislo)
+
+    def within(self, cislo, tolerance):
+        """Positions of threads with value in cislo +- tolerance."""
+        return self.range(cislo - abs(tolerance), cislo + abs(tolerance))
+
+    def mask(self, dolni=None, horni=None):
+        """Bitset (int, bit i = thread i) of threads with value in <dolni, horni>, None = open end."""
+        zacatek = 0 if dolni is None else bisect_left(self.values, dolni)
+        konec = len(self.values) if horni is None else bisect_right(self.values, horni, zacatek)
+        bity = 0
+        for i in self.positions[zacatek:konec]:
+            bity |= 1 << i
+        return bity
+
+
+class ThreadKDTree:
+    """2D KD-tree over (major diameter, pitch) of catalog threads, both in mm. Nearest neighbour queries
+    use weighted distance, so each query can normalize the axes by its own tolerances."""
+
+    def __init__(self, body):
+        """body: iterable of (prumer, stoupani, poradi), points with NaN are left out."""
+        self.koren = self._postav([b for b in body if b[0] == b[0] and b[1] == b[1]], 0)
+
+    def _postav(self, body, osa):
+        if not body:
+            return None
+        body.sort(key=lambda b: b[osa])
+        stred = len(body) // 2
+        return (body[stred], osa, self._postav(body[:stred], 1 - osa), self._postav(body[stred + 1:], 1 - osa))
+
+    def nearest(self, prumer, stoupani, k=5, vahy=(1.0, 1.0)):
+        """k nearest points as list of (vzdalenost, poradi) sorted by distance, ties by catalog order."""
+        if k <= 0:
+            return []
+        dotaz = (prumer, stoupani)
+        nejlepsi = []       # max-heap pres (-vzdalenost^2, -poradi)
+        zasobnik = [self.koren]
+        while zasobnik:
+            uzel = zasobnik.pop()
+            if uzel is None:
+                continue
+            bod, osa, levy, pravy = uzel
+            d2 = ((bod[0] - prumer) * vahy[0]) ** 2 + ((bod[1] - stoupani) * vahy[1]) ** 2
+            polozka = (-d2, -bod[2])
+            if len(nejlepsi) < k:
+                heapq.heappush(nejlepsi, polozka)
+            elif polozka > nejlepsi[0]:
+                heapq.heapreplace(nejlepsi, polozka)
+            rozdil = (dotaz[osa] - bod[osa]) * vahy[osa]
+            blizsi, vzdalenejsi = (levy, pravy) if rozdil < 0 else (pravy, levy)
+            if len(nejlepsi) < k or rozdil * rozdil <= -nejlepsi[0][0]:
+                zasobnik.append(vzdalenejsi)
+            zasobnik.append(blizsi)
+        return [(math.sqrt(-d2), -poradi) for d2, poradi in sorted(nejlepsi, reverse=True)]
+
+
+def parse_legend(types):
+    """Legend from data file header ('BSF = British Standard Fine') as dict family code -> description.
+    Combined codes (UNF/UNC) are split."""
+    legenda = {}
+    for radek in types:
+        if '=' not in radek:
+            continue
+        kody, popis = radek.split('=', 1)
+        for kod in kody.split('/'):
+            if kod.strip():
+                legenda[kod.strip()] = popis.strip()
+    return legenda
+
+
+def thread_family(name, legenda):
+    """Family code of the thread from the legend, None if it can not be recognised. Family is taken
+    from the last word of the name (1/4 UNC, 10 W.INS, 7/16 CEI20, 2BA), names M<number> are ISO metric."""
+    kody = {kod.upper(): kod for kod in legenda}
+    slova = name.upper().split()
+    if slova:
+        slovo = slova[-1].replace('.', '')
+        if slovo in kody:
+            return kody[slovo]
+        shoda = re.match(r'([A-Z]+?)\d+$', slovo) or re.match(r'\d+([A-Z]+)$', slovo)
+        if shoda and shoda.group(1) in kody:
+            return kody[shoda.group(1)]
+    if re.match(r'M\d', name) and 'M' in legenda:
+        return 'M'
+    return None
+
+
+class PrefixTrie:
+    """Case insensitive prefix trie over thread names. Every word of the name is indexed too, so '1/4'
+    and 'unc' both find '1/4 UNC'. Each node keeps positions of its subtree, whole-name matches first,
+    then word matches, both in catalog order, so suggestions cost O(len(prefix) + limit)."""
+
+    def __init__(self, nazvy):
+        self.koren = ({}, [])
+        for i, nazev in enumerate(nazvy):
+            klic = nazev.lower()
+            zacatky = [0] + [j + 1 for j, znak in enumerate(klic[:-1]) if znak == ' ' and klic[j + 1] != ' ']
+            for zacatek in zacatky:
+                uzel = self.koren
+                uzel[1].append((zacatek > 0, i))
+                for znak in klic[zacatek:]:
+                    uzel = uzel[0].setdefault(znak, ({}, []))
+                    uzel[1].append((zacatek > 0, i))
+        zasobnik = [self.koren]
+        while zasobnik:
+            deti, pozice = zasobnik.pop()
+            videne = set()
+            pozice.sort()
+            pozice[:] = [i for _, i in pozice if not (i in videne or videne.add(i))]
+            zasobnik.extend(deti.values())
+
+    def suggest(self, prefix, limit=10):
+        """Positions of names starting with prefix (whole name or any word), at most limit."""
+        uzel = self.koren
+        for znak in prefix.lower():
+            uzel = uzel[0].get(znak)
+            if uzel is None:
+                return []
+        return uzel[1][:limit]
+
+
+NUMERIC_COLUMNS = ('diaInch', 'diaMM', 'pitchTPI', 'pitchMM', 'coreDia', 'coreMM', 'depthInch', 'depthMM')
+INDEXED_ATTRIBUTES = NUMERIC_COLUMNS
+
+
+class ThreadCatalog:
+    """Immutable columnar collection of threads read from one data file. Shared by all ThreadPools.
+    Numeric attributes are kept in array('d') columns with NaN for missing values, Thread objects
+    are only a compatibility facade created on first access to threads."""
+
+    def __init__(self, lines, types, path=None, signature=None):
+        self.lines = tuple(lines)
+        self.types = tuple(types)
+        self.path = path
+        self.signature = signature
+        self._fill(parse_line(t) for t in self.lines)
+
+    @classmethod
+    def from_file(cls, path):
+        """Parses data file into new catalog."""
+        signature = _file_signature(path)
+        types, data = read_data_file(path)
+        return cls(data, types, path, signature)
+
+    @classmethod
+    def from_rows(cls, rows, types=(), chunk=1000):
+        """Builds catalog from stream of parsed rows (see parse_line), consuming it chunk by chunk.
+        Such catalog has no source lines, Thread objects are created from the columns."""
+        catalog = cls.__new__(cls)
+        catalog.lines = None
+        catalog.types = tuple(types)
+        catalog.path = None
+        catalog.signature = None
+        catalog._fill(rows, chunk)
+        return catalog
+
+    def _fill(self, rows, chunk=1000):
+        """Appends rows to name list and columns in chunks, then builds indexes and partition."""
+        rows = iter(rows)
+        names = []
+        self.columns = {a: array('d') for a in NUMERIC_COLUMNS}
+        while True:
+            blok = list(islice(rows, chunk))
+            if not blok:
+                break
+            names.extend(r[0] for r in blok)
+            for k, a in enumerate(NUMERIC_COLUMNS):
+                self.columns[a].extend(r[k + 1] for r in blok)
+        self.names = tuple(names)
+        self.indexes = {a: SortedIndex(self.columns[a]) for a in NUMERIC_COLUMNS}
+        self._threads = None
+        self._kdtree = None
+        self._partition()
+        # metricke jsou zavity rodiny M jako v list_metric_threads (bez M HOLTZ)
+        self.metric = sum(1 << i for i in self.families.get('M', ()))
+
+    def write_cache(self, target):
+        """Writes compiled catalog, see load_cache(). File is replaced atomically."""
+        n = len(self)
+        mtime, size = self.signature if self.signature is not None else (0, 0)
+        text = json.dumps({'names': self.names, 'lines': self.lines, 'types': self.types,
+                           'families': list(self.families.items())}).encode('utf-8')
+        # vlastni docasny soubor pro kazdy zapis, soubezne startujici procesy si ho neprepisuji
+        fd, docasny = tempfile.mkstemp(prefix=os.path.basename(target) + '.', dir=os.path.dirname(target) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, mtime, size, n, len(text)))
+                for a in NUMERIC_COLUMNS:
+                    index = self.indexes[a]
+                    f.write(struct.pack('<q', len(index.values)))
+                    f.write(array('d', self.columns[a]).tobytes())
+                    f.write(array('d', index.values).tobytes())
+                    f.write(array('q', index.positions).tobytes())
+                f.write(self.metric.to_bytes(_metric_bytes(n), 'little'))
+                f.write(text)
+            os.chmod(docasny, 0o644)    # mkstemp vytvari soubor jen pro vlastnika
+            os.replace(docasny, target)
+        except BaseException:
+            try:
+                os.remove(docasny)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load_cache(cls, target, signature=None):
+        """Maps compiled catalog into memory. Columns and indexes are memoryviews of the file, texts
+        are decoded in one step. Returns None if file does not belong to source with given signature."""
+        with open(target, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, mtime, size, n, delka = _CACHE_HEADER.unpack_from(data)
+        if magic != _CACHE_MAGIC or (signature is not None and (mtime, size) != tuple(signature)):
+            data.close()
+            return None
+        delka_souboru = len(data)
+
+        def kontroluj(konec):
+            if konec > delka_souboru:
+                raise ValueError('truncated catalog cache: ' + str(target))
+
+        if n < 0 or delka < 0:
+            raise ValueError('corrupt catalog cache: ' + str(target))
+        pohled = memoryview(data)
+        pozice = _CACHE_HEADER.size
+        catalog = cls.__new__(cls)
+        catalog.columns = {}
+        catalog.indexes = {}
+        for a in NUMERIC_COLUMNS:
+            kontroluj(pozice + 8)
+            pocet = struct.unpack_from('<q', data, pozice)[0]
+            pozice += 8
+            if not 0 <= pocet <= n:
+                raise ValueError('corrupt catalog cache: ' + str(target))
+            kontroluj(pozice + 8 * n + 16 * pocet)
+            catalog.columns[a] = pohled[pozice:pozice + 8 * n].cast('d')
+            pozice += 8 * n
+            hodnoty = pohled[pozice:pozice + 8 * pocet].cast('d')
+            pozice += 8 * pocet
+            poradi = pohled[pozice:pozice + 8 * pocet].cast('q')
+            pozice += 8 * pocet
+            catalog.indexes[a] = SortedIndex.from_sorted(hodnoty, poradi)
+        kontroluj(pozice + _metric_bytes(n) + delka)
+        catalog.metric = int.from_bytes(data[pozice:pozice + _metric_bytes(n)], 'little')
+        pozice += _metric_bytes(n)
+        texty = json.loads(data[pozice:pozice + delka].decode('utf-8'))
+        catalog.names = tuple(texty['names'])
+        catalog.lines = tuple(texty['lines']) if texty['lines'] is not None else None
+        catalog.types = tuple(texty['types'])
+        catalog.path = None
+        catalog.signature = (mtime, size)
+        catalog._threads = None
+        catalog._kdtree = None
+        catalog._mapa = data
+        catalog._partition({rodina: tuple(pozice) for rodina, pozice in texty['families']})
+        return catalog
+
+    @property
+    def threads(self):
+        """Thread objects in catalog order, each built lazily on first access (see ThreadRows)."""
+        if self._threads is None:
+            self._threads = ThreadRows(self)
+        return self._threads
+
+    def _build_thread(self, i):
+        if self.lines is not None:
+            return extract_thread(self.lines[i])
+        return self._thread_from_columns(i)
+
+    def _thread_from_columns(self, i):
+        hodnoty = [self.columns[a][i] for a in NUMERIC_COLUMNS]
+        return Thread(self.names[i], *[h if h == h else 'N/A' for h in hodnoty])
+
+    def __len__(self):
+        return len(self.names)
+
+    def _partition(self, rodiny=None):
+        """Splits catalog into families by legend (or takes stored partition of compiled catalog)."""
+        self.legend = parse_legend(self.types)
+        if rodiny is None:
+            rodiny = {}
+            for i, nazev in enumerate(self.names):
+                rodiny.setdefault(thread_family(nazev, self.legend), []).append(i)
+            rodiny = {rodina: tuple(pozice) for rodina, pozice in rodiny.items()}
+        self.families = rodiny
+        self.family_of = {i: rodina for rodina, pozice in rodiny.items() for i in pozice}
+        self._trie = None
+        self._family_threads = {}
+
+    @property
+    def trie(self):
+        """Prefix trie over names, built on first autocomplete query."""
+        if self._trie is None:
+            self._trie = PrefixTrie(self.names)
+        return self._trie
+
+    def family_threads(self, rodina):
+        """Threads of one family in catalog order, tuple is built once and then shared."""
+        vlakna = self._family_threads.get(rodina)
+        if vlakna is None:
+            vlakna = tuple(self.threads[i] for i in self.families.get(rodina, ()))
+            self._family_threads[rodina] = vlakna
+        return vlakna
+
+    @property
+    def spatial_index(self):
+        """KD-tree over (diameter mm, pitch mm), built on first use. Missing mm values are
+        computed from inch diameter and TPI."""
+        if self._kdtree is None:
+            self._kdtree = ThreadKDTree(
+                (self.diameter_mm(i), self.pitch_mm(i), i) for i in range(len(self)))
+        return self._kdtree
+
+    def diameter_mm(self, i):
+        prumer = self.columns['diaMM'][i]
+        return prumer if prumer == prumer else self.columns['diaInch'][i] * 25.4
+
+    def pitch_mm(self, i):
+        stoupani = self.columns['pitchMM'][i]
+        return stoupani if stoupani == stoupani else 25.4 / self.columns['pitchTPI'][i]
+
+    def mask(self, metric=None, **rozsahy):
+        """Bitset of threads fulfilling all conditions. rozsahy maps column name to (dolni, horni),
+        None for open end, e.g. mask(metric=True, pitchMM=(0.5, 1.0), coreMM=(5, None))."""
+        bity = (1 << len(self)) - 1
+        if metric is not None:
+            bity &= self.metric if metric else ~self.metric
+        for atribut, (dolni, horni) in rozsahy.items():
+            if atribut not in self.indexes:
+                raise ValueError('unknown thread column: ' + atribut)
+            bity &= self.indexes[atribut].mask(dolni, horni)
+        return bity
+
+    def select(self, metric=None, **rozsahy):
+        """Positions of threads fulfilling mask() conditions, in catalog order."""
+        bity = self.mask(metric, **rozsahy)
+        vysledek = []
+        while bity:
+            nizsi = bity & -bity
+            vysledek.append(nizsi.bit_length() - 1)
+            bity ^= nizsi
+        return vysledek
+
+
+def _file_signature(path):
+    """Modification time and size of the file, changes whenever the file is rewritten."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+_CACHE_MAGIC = b'FTCAT03\0'
+_CACHE_HEADER = struct.Struct('<8sqqqq')    # magic, mtime_ns a velikost zdroje, pocet zavitu, delka textu
+
+
+def _metric_bytes(n):
+    """Bytes of metric bitset, padded to 8 so that following data stay aligned."""
+    return (n + 63) // 64 * 8
+
+
+def cache_path(path):
+    """Compiled catalog lives next to the source: FINDTHRD.DAT -> FINDTHRD.cat"""
+    return os.path.splitext(path)[0] + '.cat'
+
+
+def compile_catalog(path=None, target=None):
+    """Parses data file and writes compiled catalog, returns path of the compiled file."""
+    path = os.path.abspath(path if path is not None else __FILE__)
+    target = target if target is not None else cache_path(path)
+    ThreadCatalog.from_file(path).write_cache(target)
+    return target
+
+
+def load_catalog(path, cache=True):
+    """Loads catalog from compiled file if it matches the source, otherwise parses the source
+    and (re)writes compiled file. Unwritable data directory only disables the cache."""
+    if not cache:
+        return ThreadCatalog.from_file(path)
+    signature = _file_signature(path)
+    target = cache_path(path)
+    try:
+        catalog = ThreadCatalog.load_cache(target, signature)
+    except (OSError, ValueError, TypeError, KeyError, struct.error):     # poskozeny soubor se prelozi znovu
+        catalog = None
+    if catalog is None:
+        catalog = ThreadCatalog.from_file(path)
+        try:
+            catalog.write_cache(target)
+        except OSError:
+            pass
+    catalog.path = path
+    return catalog
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path=None, cache=True):
+    """Returns shared catalog for data file (FINDTHRD.DAT by default), loaded lazily on first use
+    and again only when the file signature (mtime, size) changes."""
+    path = os.path.abspath(path if path is not None else __FILE__)
+    catalog = _catalogs.get(path)
+    if catalog is None or catalog.signature != _file_signature(path):
+        with _catalogs_lock:
+            catalog = _catalogs.get(path)
+            if catalog is None or catalog.signature != _file_signature(path):
+                catalog = load_catalog(path, cache)
+                _catalogs[path] = catalog
+    return catalog
+
+
+IMPORT_COLUMNS = ('name',) + NUMERIC_COLUMNS
+
+
+def _import_number(hodnota):
+    """Number from CSV/JSON value, None and empty string are missing values (NaN)."""
+    if hodnota is None:
+        return math.nan
+    if isinstance(hodnota, str):
+        return parse_number(hodnota)
+    if isinstance(hodnota, (int, float)) and not isinstance(hodnota, bool):
+        return float(hodnota)
+    raise ValueError('not a number: ' + repr(hodnota))
+
+
+def validate_row(row, misto):
+    """Checks parsed row and completes mm diameter and pitch from inch values. Numeric values have to be
+    missing (NaN) or positive finite numbers, name, diameter and pitch are mandatory.
+    :param misto: row location for error message (file:line)
+    :return: validated row"""
+    name, *hodnoty = row
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(misto + ': missing thread name')
+    for atribut, hodnota in zip(NUMERIC_COLUMNS, hodnoty):
+        if hodnota == hodnota and not 0 < hodnota < math.inf:
+            raise ValueError('{}: {} of {} has to be positive number, got {}'.format(misto, atribut, name, hodnota))
+    di, dmm, tpi, pmm = hodnoty[:4]
+    if dmm != dmm:
+        dmm = di * 25.4
+    if pmm != pmm and tpi == tpi:
+        pmm = 25.4 / tpi
+    if dmm != dmm or pmm != pmm:
+        raise ValueError('{}: {} needs diameter and pitch in mm or inch'.format(misto, name))
+    return (name.strip(), di, dmm, tpi, pmm) + tuple(hodnoty[4:])
+
+
+def iter_dat_rows(path):
+    """Streams validated rows from fixed-width data file (FINDTHRD.DAT layout)."""
+    with open(path) as file:
+        for druh, line in _legend_and_data(file):
+            if druh != 'data':
+                continue
+            misto = '{}: {!r}'.format(path, line.rstrip())
+            try:
+                row = parse_line(line)
+            except ValueError as e:
+                raise ValueError('{}: {}'.format(misto, e))
+            yield validate_row(row, misto)
+
+
+def iter_csv_rows(path):
+    """Streams validated rows from CSV file with header, columns named as Thread attributes
+    (name, diaInch, diaMM, pitchTPI, pitchMM, coreDia, coreMM, depthInch, depthMM), missing columns are N/A."""
+    with open(path, newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None or 'name' not in reader.fieldnames:
+            raise ValueError(path + ': CSV header has to contain column name')
+        for zaznam in reader:
+            misto = '{}:{}'.format(path, reader.line_num)
+            try:
+                row = (zaznam['name'],) + tuple(_import_number(zaznam.get(a)) for a in NUMERIC_COLUMNS)
+            except ValueError as e:
+                raise ValueError('{}: {}'.format(misto, e))
+            yield validate_row(row, misto)
+
+
+def iter_jsonl_rows(path):
+    """Streams validated rows from JSON lines file, one object per line with keys as in CSV."""
+    with open(path) as file:
+        for cislo, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            misto = '{}:{}'.format(path, cislo)
+            try:
+                zaznam = json.loads(line)
+                if not isinstance(zaznam, dict):
+                    raise ValueError('expected JSON object')
+                row = (zaznam.get('name'),) + tuple(_import_number(zaznam.get(a)) for a in NUMERIC_COLUMNS)
+            except ValueError as e:
+                raise ValueError('{}: {}'.format(misto, e))
+            yield validate_row(row, misto)
+
+
+_READERS = {'dat': iter_dat_rows, 'csv': iter_csv_rows, 'jsonl': iter_jsonl_rows}
+
+
+def catalog_format(path):
+    """Format of catalog file by extension: csv, jsonl (.jsonl, .ndjson), otherwise fixed-width dat."""
+    pripona = os.path.splitext(path)[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(pripona, 'dat')
+
+
+def iter_rows(path, format=None):
+    """Streams rows of one catalog file, format dat/csv/jsonl is guessed from extension if not given."""
+    if format is None:
+        format = catalog_format(path)
+    if format not in _READERS:
+        raise ValueError('unknown catalog format: ' + str(format))
+    return _READERS[format](path)
+
+
+def merge_rows(*proudy):
+    """Chains row streams and drops duplicates, i.e. rows with the same name (case and whitespace
+    insensitive), diameter and pitch in mm. The first occurrence wins, so earlier catalogs take
+    precedence. Same name with different geometry is kept (FINDTHRD.DAT has two 5 1/2 WPIPE)."""
+    videne = set()
+    for proud in proudy:
+        for row in proud:
+            klic = (' '.join(row[0].lower().split()), round(row[2], 3), round(row[4], 4))
+            if klic not in videne:
+                videne.add(klic)
+                yield row
+
+
+def import_catalog(*paths, chunk=1000):
+    """Imports and merges thread catalogs (fixed-width DAT, CSV, JSONL) into one indexed catalog.
+    Rows are streamed, only one chunk of parsed rows is held besides the catalog columns.
+    Legends of DAT sources are merged."""
+    types = []
+    for path in paths:
+        if catalog_format(path) == 'dat':
+            types.extend(line for line in read_legend(path) if line not in types)
+    return ThreadCatalog.from_rows(merge_rows(*(iter_rows(path) for path in paths)), types, chunk)
+
+
+def benchmark_cold_start(path=None, opakovani=20):
+    """Measures average cold start of the catalog in ms: parsing the source vs. mapping compiled file."""
+    path = os.path.abspath(path if path is not None else __FILE__)
+    target = compile_catalog(path)
+    signature = _file_signature(path)
+    vysledky = {}
+    for nazev, nacti in (('parse', lambda: ThreadCatalog.from_file(path)),
+                         ('cache', lambda: ThreadCatalog.load_cache(target, signature))):
+        zacatek = time.perf_counter()
+        for _ in range(opakovani):
+            nacti()
+        vysledky[nazev] = (time.perf_counter() - zacatek) * 1000 / opakovani
+    return vysledky
+
+
 class ThreadPool:
     """Reads all threads from source file FINDTHRD.TXT and allows operations on this collection."""
 
-    def __init__(self):
-        self.threadBin, self.threadData = self.read_up_data()  # fill the bin with threads from the file
-
-    def search_threads(self, cislo, units ='mm', kriterium='pitch'):
-        """Searches threads in kos container for cislo."""
-        fit = []
+    def __init__(self, catalog=None):
+        """Pool is a cheap view onto the shared catalog, the file is parsed once per process."""
+        self.catalog = catalog if catalog is not None else get_catalog()
+        self.threadData = self.catalog.types
+
+    @property
+    def threadBin(self):
+        return self.catalog.threads
+
+    def filter(self, metric=None, **rozsahy):
+        """Threads fulfilling all conditions, see ThreadCatalog.mask()."""
+        return [self.threadBin[i] for i in self.catalog.select(metric, **rozsahy)]
+
+    def search_threads(self, cislo, units ='mm', kriterium='pitch', tolerance=0):
+        """Searches threads in kos container for cislo. With tolerance > 0 returns threads
+        within cislo +- tolerance (measured values). Result keeps catalog order."""
+        return self._search(units, kriterium, lambda index: index.within(cislo, tolerance))
+
+    def search_range(self, dolni, horni, units='mm', kriterium='pitch'):
+        """Searches threads with diameter or pitch between dolni and horni (both included)."""
+        return self._search(units, kriterium, lambda index: index.range(dolni, horni))
+
+    def identify(self, prumer, stoupani, units='mm', tolerance_prumeru=None, tolerance_stoupani=None, k=5):
+        """Identifies measured thread, returns k nearest catalog threads as ThreadMatch sorted by
+        normalized distance sqrt((dD/tolD)^2 + (dP/tolP)^2), 1.0 is the edge of the tolerance.
+        units 'mm': diameter and pitch in mm; 'in' or 'tpi': diameter in inches, pitch in TPI.
+        Tolerances are in the same units, default 0.2 mm on diameter and 0.05 mm on pitch.
+        Deviations in the result are in mm (measured minus catalog)."""
+        if prumer <= 0 or stoupani <= 0:
+            raise ValueError('measured diameter and pitch have to be positive')
+        if units == 'mm':
+            prumer_mm, stoupani_mm = prumer, stoupani
+            tol_prumeru = 0.2 if tolerance_prumeru is None else tolerance_prumeru
+            tol_stoupani = 0.05 if tolerance_stoupani is None else tolerance_stoupani
+        elif units == 'in' or units == 'tpi':
+            prumer_mm, stoupani_mm = prumer * 25.4, 25.4 / stoupani
+            tol_prumeru = 0.2 if tolerance_prumeru is None else tolerance_prumeru * 25.4
+            # tolerance v TPI prevedena derivaci p = 25.4/tpi
+            tol_stoupani = 0.05 if tolerance_stoupani is None else 25.4 * tolerance_stoupani / stoupani ** 2
+        else:
+            raise ValueError("expected units mm or in, got: " + units)
+        if tol_prumeru <= 0 or tol_stoupani <= 0:
+            raise ValueError('tolerances have to be positive')
+        katalog = self.catalog
+        vysledek = []
+        for vzdalenost, i in katalog.spatial_index.nearest(prumer_mm, stoupani_mm, k,
+                                                           (1 / tol_prumeru, 1 / tol_stoupani)):
+            odchylka_prumeru = prumer_mm - katalog.diameter_mm(i)
+            odchylka_stoupani = stoupani_mm - katalog.pitch_mm(i)
+            vysledek.append(ThreadMatch(self.threadBin[i], vzdalenost, odchylka_prumeru, odchylka_stoupani,
+                                        abs(odchylka_prumeru) <= tol_prumeru and abs(odchylka_stoupani) <= tol_stoupani))
+        return vysledek
+
+    def _search(self, units, kriterium, dotaz):
         if units == 'mm' or units == 'tpi' or kriterium == 'pitch' or kriterium == 'diameter':
             if kriterium == 'diameter':
-                if units == 'mm':
-                    for t in self.threadBin:
-                        if t.fits_major_diameter_mm(cislo):
-                            fit.append(t)
-                else:
-                    for t in self.threadBin:
-                        if t.fits_major_diameter_in(cislo):
-                            fit.append(t)
+                atribut = 'diaMM' if units == 'mm' else 'diaInch'
             else:           # kriterium == 'pitch'
-                if units == 'mm':
-                    for t in self.threadBin:
-                        if t.fits_pitch_mm(cislo):
-                            fit.append(t)
-                else:
-                    for t in self.threadBin:
-                        if t.fits_pitch_tpi(cislo):
-                            fit.append(t)
+                atribut = 'pitchMM' if units == 'mm' else 'pitchTPI'
         else:
             raise ValueError("expected diameter or pitch in mm or in, got: " + kriterium + ' ' + units)
-        return fit
+        return [self.threadBin[i] for i in dotaz(self.catalog.indexes[atribut])]
 
     def read_up_data(self):
         """Reads data from file, creates threads and returns thread tuple."""
@@ -181,52 +924,11 @@ class ThreadPool:
 
     def open_data_file(self):
         """Reads file FINDTHRD.TXT."""
-        dataLines = []
-        types = []
-        with open(__FILE__) as file:
-            counter = 0
-            for line in file:
-                if counter > 4 and counter < 27:
-                    types.append(line)
-                if (counter > 27) and (counter < 36):
-                    pass
-                if counter >= 32 and not line.startswith("ENDOFDATA"):
-                    if line.startswith(';'): pass
-                    else: dataLines.append(line)
-                if line.startswith("ENDOFDATA"):
-                    break
-                counter += 1
-        return tuple(types), tuple(dataLines)
+        return read_data_file(__FILE__)
 
     def extract_thread(self, t):
         """extracts information from file line and returns new Thread"""
-        n = t[0:11].strip()         # thread name
-        di = t[12:19].strip()       # diameter [in]
-        dmm = t[20:27].strip()      # diameter [mm]
-        ptp = t[28:34].strip()      # pitch [tpi]
-        pmm = t[35:42].strip()      # pitch [mm]
-        cd = t[43:50]               # core diameter [in]
-        cmm = t[51:58]              # core diameter [mm]
-        din = t[59:66]              # depth [in]
-        dmmd = t[67:72]             # depth [mm]
-
-        # korekce kvuli moznym chybejicim cislum
-        if di.isspace() or di == '': di = 'N/A'     # metricke zavity nemaji inch diam
-        else: di.strip()
-        if ptp.isspace() or ptp == '': ptp = 'N/A'     # metricke zavity nemaji TPI pitch
-        else: ptp.strip()
-        if cd.isspace() or cd == '': cd = 'N/A'
-        else: cd.strip()
-        if cmm.isspace() or cmm == '': cmm = 'N/A'
-        else: cmm.strip()
-        if din.isspace() or din == '': din = 'N/A'
-        else: din.strip()
-        if dmmd.isspace() or dmmd == '': dmmd = 'N/A'
-        else: dmmd.strip()
-        if (di == 'N/A'):               # metric thread
-            return Thread(n, di, float(dmm), ptp, float(pmm), cd, cmm, din, dmmd)
-        else:                           # all other threads
-            return Thread(n, float(di), float(dmm), float(ptp), float(pmm), cd, cmm, din, dmmd)
+        return extract_thread(t)
 
     def list_threads(self):
         for th in self.threadData:
@@ -234,15 +936,19 @@ class ThreadPool:
 
     def list_metric_threads(self):
         """Vrati metricke zavity v tuple."""
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), '../DaPTools/src'))
-        from daptools.myTools import contains as contain
-        metric = []
-        for t in self.threadBin:
-            if t.is_metric() and not contain(t.name, 'HOLTZ'):   # vyhazuji jine nez metricke a Holtzapfels zavity
-                metric.append(t)
-        return tuple(metric)
+        return self.catalog.family_threads('M')     # bez Holtzapfels zavitu (M HOLTZ)
+
+    def list_family(self, rodina):
+        """Vrati zavity jedne rodiny (kod z legendy: M, UNC, BSF, BA, Whit, HOLTZ...) v tuple."""
+        return self.catalog.family_threads(rodina)
+
+    def families(self):
+        """Family codes with descriptions from the legend, only families present in the catalog."""
+        return {kod: popis for kod, popis in self.catalog.legend.items() if kod in self.catalog.families}
+
+    def suggest(self, prefix, limit=10):
+        """Autocomplete of thread names, returns threads whose name or any word of name starts with prefix."""
+        return [self.threadBin[i] for i in self.catalog.trie.suggest(prefix, limit)]
 
 def ui_inint():
     import sys
@@ -261,7 +967,12 @@ def ui_inint():
 
 
 if __name__ == "__main__":
-
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == '--compile':
+        zdroj = sys.argv[2] if len(sys.argv) > 2 else None
+        print('compiled catalog written to ' + compile_catalog(zdroj))
+        print('cold start [ms]: ' + str(benchmark_cold_start(zdroj)))
+        sys.exit(0)
 
     cislo, units, kriterium = ui_inint()
 
@@ -4,21 +4,23 @@
 Web GUI pro výpočty dělicí hlavy
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from deleni import DeliciHlava
-from differentialThread import DifferentialThread
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from deleni import DeliciHlava, ziskej_index
+from differentialThread import DifferentialThread, get_inventory
 from DivisionPlatePlain import calculate_disks_radius
 from findThread import ThreadPool
 from knurling import count_crest_num4_dia
 from plochyNaHrideli import PlochyNaHrideli
 from pulleys import calculate2_pulleys, find_driven_diameter
 from sineBar import calculate_link_sine_bar, calculate_contact_sine_bar
-from tappingDrills import MetricThread
+from tappingDrills import (DrillTable, TappingDrills, EXPORTERY, catalog_drill_table, drill_report, mrizka_sil,
+                           sklad_z_parametru)
 from triangles import RightTriangle, CommonTriangle, PrecisionSettings
 from daptools.redeni import dilution, mixing
+import json
 import math
 
-# Thread pitch constants for performance
+# Fallback thread pitches when data/DIFFTHRD.DAT cannot be read
 STOUPANI_MM = [0.4, 0.45, 0.5, 0.6, 0.7, 0.75, 0.8, 1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0]
 STOUPANI_TPI = [4, 4.5, 5, 5.5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 16, 18, 20, 24, 28, 32, 36, 40, 44, 48, 56, 64, 72, 80]
 
@@ -43,6 +45,21 @@ def safe_int(value, param_name):
     except (ValueError, TypeError):
         raise ValueError(f"Invalid integer value for {param_name}: {value}")
 
+_posledni_inventar = (tuple(STOUPANI_TPI), tuple(STOUPANI_MM))
+
+def stoupani_inventar():
+    """Return (tpi, mm) pitch inventory shared by all requests, reloaded when DIFFTHRD.DAT changes.
+    An unreadable or malformed file keeps the last good inventory (the built-in fallback at first)"""
+    global _posledni_inventar
+    try:
+        _posledni_inventar = get_inventory().get()
+    except (OSError, ValueError):
+        pass
+    return _posledni_inventar
+
+stoupani_inventar()     # parse the inventory once at startup
+catalog_drill_table()   # precompute drills for every catalog thread once at startup
+
 app = Flask(__name__)
 
 @app.route('/static/data/<path:filename>')
@@ -161,8 +178,7 @@ def vypocitat_pocty():
     ratio_table = int(data.get('ratio_table', 120))
     pocet_der = int(data.get('pocet_der'))
     
-    hlava = DeliciHlava(ratio, ratio_table)
-    deleni = hlava.prozkoumej_deleni(pocet_der)
+    deleni = ziskej_index(ratio, ratio_table).deleni_pro_kruh(pocet_der, ratio)
     max_deleni = pocet_der * ratio
     
     return jsonify({
@@ -172,15 +188,51 @@ def vypocitat_pocty():
         'celkem': len(deleni)
     })
 
+REZIMY_DELENI = ('plain', 'differential', 'angle')
+
 @app.route('/api/deleni', methods=['POST'])
 def vypocitat_deleni():
     data = request.json
     ratio = int(data.get('ratio', 40))
     ratio_table = int(data.get('ratio_table', 120))
-    deleni = int(data.get('deleni'))
     use_table = data.get('use_table', False)
+    mode = data.get('mode', 'plain')
+    if mode not in REZIMY_DELENI:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown mode: {}, accepted modes: {}'.format(mode, ', '.join(REZIMY_DELENI))
+        }), 400
     
     hlava = DeliciHlava(ratio, ratio_table)
+    if mode == 'angle':
+        plan = hlava.uhlove_deleni(float(data.get('stupne', 0)), float(data.get('minuty', 0)),
+                                   float(data.get('sekundy', 0)), use_table)
+        return jsonify({
+            'ratio': ratio,
+            'ratio_table': ratio_table,
+            'mode': mode,
+            'success': True,
+            'use_table': use_table,
+            'uhlove': plan._asdict()
+        })
+
+    deleni = int(data.get('deleni'))
+    if mode == 'differential':
+        plan = hlava.diferencialni_deleni(deleni, use_table)
+        result = {
+            'deleni': deleni,
+            'ratio': ratio,
+            'ratio_table': ratio_table,
+            'mode': mode,
+            'success': plan is not None,
+            'use_table': use_table
+        }
+        if plan is not None:
+            result['diferencialni'] = plan._asdict()
+        else:
+            result['error'] = 'Nelze najít vhodná výměnná kola'
+        return jsonify(result)
+
     pocet_der = hlava.vypocti_pocet_der(deleni, use_table)
     
     result = {
@@ -194,9 +246,34 @@ def vypocitat_deleni():
     
     if pocet_der > 0:
         result['nasobky'] = [pocet_der * i for i in range(1, 6)]
+        index = ziskej_index(ratio, ratio_table)
+        plany = index.plany(deleni, ratio_table if use_table else ratio)
+        result['plany'] = [plan._asdict() for plan in plany]
     
     return jsonify(result)
 
+@app.route('/api/deleni/sequence', methods=['POST'])
+def sekvence_deleni():
+    data = request.json
+    ratio = int(data.get('ratio', 40))
+    ratio_table = int(data.get('ratio_table', 120))
+    use_table = data.get('use_table', False)
+    
+    try:
+        deleni = safe_int(data.get('deleni'), 'deleni')
+        kruh = data.get('kruh')
+        if kruh is not None:
+            kruh = safe_int(kruh, 'kruh')
+        hlava = DeliciHlava(ratio, ratio_table)
+        kroky = hlava.sekvence_deleni(deleni, use_table, kruh)     # kontrola parametru jeste pred streamem
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    return Response((json.dumps(krok._asdict()) + '\n' for krok in kroky), mimetype='application/x-ndjson')
+
 @app.route('/api/options')
 def get_options():
     hlava = DeliciHlava()
@@ -210,19 +287,19 @@ def calculate_differential():
     data = request.json
     pozadovane_stoupani = float(data.get('pozadovane_stoupani'))
     jednotky = data.get('jednotky', 'mm')
-    
-    # Kontrola, zda je požadované stoupání přímo dostupné
-    dostupne_hodnoty = STOUPANI_MM if jednotky == 'mm' else STOUPANI_TPI
-    if pozadovane_stoupani in dostupne_hodnoty:
-        return jsonify({
-            'success': False,
-            'error': f'Stoupání {pozadovane_stoupani} {jednotky} je přímo dostupné - nepotřebujete diferenciální závit!'
-        })
-    
     dt = DifferentialThread()
     
     try:
-        kombinace = dt.vyzkousej_kombinace(pozadovane_stoupani, STOUPANI_TPI, STOUPANI_MM, jednotky)
+        stoupani_tpi, stoupani_mm = stoupani_inventar()
+        # Kontrola, zda je požadované stoupání přímo dostupné
+        dostupne_hodnoty = stoupani_mm if jednotky == 'mm' else stoupani_tpi
+        if pozadovane_stoupani in dostupne_hodnoty:
+            return jsonify({
+                'success': False,
+                'error': f'Stoupání {pozadovane_stoupani} {jednotky} je přímo dostupné - nepotřebujete diferenciální závit!'
+            })
+        
+        kombinace = dt.vyzkousej_kombinace(pozadovane_stoupani, stoupani_tpi, stoupani_mm, jednotky)
         
         if kombinace:
             result = {
@@ -234,6 +311,25 @@ def calculate_differential():
                 'efektivni_stoupani': kombinace[2],
                 'odchylka': abs(pozadovane_stoupani - kombinace[2])
             }
+            k = data.get('k')
+            tolerance = data.get('tolerance')
+            if tolerance is not None:
+                dalsi = dt.kombinace_v_toleranci(pozadovane_stoupani, safe_float(tolerance, 'tolerance'),
+                                                 stoupani_tpi, stoupani_mm, jednotky)
+                if k is not None:
+                    dalsi = dalsi[:safe_int(k, 'k')]
+            elif k is not None:
+                dalsi = dt.nejblizsi_kombinace(pozadovane_stoupani, stoupani_tpi, stoupani_mm, jednotky,
+                                               safe_int(k, 'k'))
+            else:
+                dalsi = None
+            if dalsi is not None:
+                result['kombinace'] = [{
+                    'hruby_zavit': hruby,
+                    'jemny_zavit': jemny,
+                    'efektivni_stoupani': pe,
+                    'odchylka': abs(pozadovane_stoupani - pe)
+                } for hruby, jemny, pe in dalsi]
         else:
             result = {
                 'success': False,
@@ -247,6 +343,45 @@ def calculate_differential():
     
     return jsonify(result)
 
+@app.route('/api/differential/plan', methods=['POST'])
+def plan_differential():
+    data = request.json
+    
+    def cislo_nebo_seznam(hodnota, nazev):
+        if isinstance(hodnota, list):
+            return [safe_float(v, nazev) for v in hodnota]
+        return safe_float(hodnota, nazev)
+    
+    try:
+        hruby = safe_float(data.get('hruby_zavit'), 'hruby_zavit')
+        jemny = safe_float(data.get('jemny_zavit'), 'jemny_zavit')
+        pohyby = cislo_nebo_seznam(data.get('pohyby'), 'pohyby')
+        hruba_matka = cislo_nebo_seznam(data.get('hruba_matka', 4), 'hruba_matka')
+        jemna_matka = cislo_nebo_seznam(data.get('jemna_matka', 2), 'jemna_matka')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    try:
+        plany = DifferentialThread().naplanuj_pohyb(hruby, jemny, pohyby, hruba_matka, jemna_matka)
+        result = {
+            'success': True,
+            'hruby_zavit': hruby,
+            'jemny_zavit': jemny,
+            'efektivni_stoupani': DifferentialThread().calculate_diff_thread(hruby, jemny),
+            'plany': [plan._asdict() for plan in plany],
+            'count': len(plany)
+        }
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    
+    return jsonify(result)
+
 @app.route('/api/division-plate', methods=['POST'])
 def calculate_division_plate():
     data = request.json
@@ -278,10 +413,11 @@ def find_thread_api():
     value = float(data.get('value'))
     units = data.get('units', 'mm')
     criterion = data.get('criterion', 'diameter')
+    tolerance = float(data.get('tolerance', 0))
     
     try:
         thread_pool = ThreadPool()
-        results = thread_pool.search_threads(value, units, criterion)
+        results = thread_pool.search_threads(value, units, criterion, tolerance)
         
         threads_data = []
         for thread in results:
@@ -298,6 +434,86 @@ def find_thread_api():
             'value': value,
             'units': units,
             'criterion': criterion,
+            'tolerance': tolerance,
+            'threads': threads_data,
+            'count': len(threads_data)
+        }
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    
+    return jsonify(result)
+
+@app.route('/api/find-thread/suggest')
+def suggest_thread_api():
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    
+    try:
+        thread_pool = ThreadPool()
+        catalog = thread_pool.catalog
+        suggestions = []
+        for i in catalog.trie.suggest(prefix, limit):
+            family = catalog.family_of[i]
+            suggestions.append({
+                'name': catalog.names[i],
+                'family': family,
+                'family_name': catalog.legend.get(family)
+            })
+        
+        result = {
+            'success': True,
+            'query': prefix,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        }
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    
+    return jsonify(result)
+
+@app.route('/api/find-thread/identify', methods=['POST'])
+def identify_thread_api():
+    data = request.json
+    diameter = float(data.get('diameter'))
+    pitch = float(data.get('pitch'))
+    units = data.get('units', 'mm')
+    tolerance_diameter = data.get('tolerance_diameter')
+    tolerance_pitch = data.get('tolerance_pitch')
+    k = int(data.get('k', 5))
+    
+    try:
+        matches = ThreadPool().identify(
+            diameter, pitch, units,
+            float(tolerance_diameter) if tolerance_diameter is not None else None,
+            float(tolerance_pitch) if tolerance_pitch is not None else None,
+            k)
+        
+        threads_data = []
+        for match in matches:
+            thread = match.thread
+            threads_data.append({
+                'name': thread.name,
+                'diameter_mm': thread.diaMM if thread.diaMM != 'N/A' else None,
+                'diameter_in': thread.diaInch if thread.diaInch != 'N/A' else None,
+                'pitch_mm': thread.pitchMM if thread.pitchMM != 'N/A' else None,
+                'pitch_tpi': thread.pitchTPI if thread.pitchTPI != 'N/A' else None,
+                'distance': round(match.vzdalenost, 4),
+                'diameter_deviation_mm': round(match.odchylka_prumeru, 4),
+                'pitch_deviation_mm': round(match.odchylka_stoupani, 4),
+                'within_tolerance': match.v_toleranci
+            })
+        
+        result = {
+            'success': True,
+            'diameter': diameter,
+            'pitch': pitch,
+            'units': units,
             'threads': threads_data,
             'count': len(threads_data)
         }
@@ -516,15 +732,45 @@ def calculate_sine_bar():
     
     return jsonify(result)
 
+def stock_drill_json(vyber):
+    """VrtakZeSkladu as JSON object, None if the inventory has no such drill"""
+    if vyber is None:
+        return None
+    return {
+        'drill': vyber.vrtak.oznaceni,
+        'diameter_mm': round(vyber.vrtak.prumer, 4),
+        'kind': vyber.vrtak.druh,
+        'engagement': round(vyber.sila, 1)
+    }
+
 @app.route('/api/tapping-drills', methods=['POST'])
 def calculate_tapping_drill():
     data = request.json
-    thread_diameter = float(data.get('thread_diameter'))
-    thread_pitch = float(data.get('thread_pitch'))
     thread_strength = float(data.get('thread_strength', 75))
+    strengths = data.get('strengths')          # volitelne: seznam sil nebo {'from', 'to', 'step'}
     
     try:
-        drill_diameter = MetricThread.countTapDrillSingle(thread_diameter, thread_pitch, thread_strength)
+        thread_name = data.get('thread_name')
+        if thread_name:
+            # zavit z katalogu: vrtaky z predpocitane tabulky, mimo jeji sily jen pro tento radek
+            catalog_table = catalog_drill_table()
+            row = catalog_table.find(thread_name)
+            table = catalog_table.tabulka
+            form = catalog_table.tvary[row]
+        else:
+            table = DrillTable([safe_float(data.get('thread_diameter'), 'thread_diameter')],
+                               [safe_float(data.get('thread_pitch'), 'thread_pitch')], ())
+            row = 0
+            form = None
+        thread_diameter = table.prumery[row]
+        thread_pitch = table.stoupani[row]
+        coefficient = table.koeficient(row)
+        if isinstance(strengths, dict):
+            strengths = mrizka_sil(int(strengths.get('from', 50)), int(strengths.get('to', 90)),
+                                   int(strengths.get('step', 1)))
+        inventory = sklad_z_parametru(data.get('inventory'))
+        snap = data.get('snap')
+        drill_diameter = table.drill(row, thread_strength)
         
         result = {
             'success': True,
@@ -533,6 +779,88 @@ def calculate_tapping_drill():
             'thread_strength': thread_strength,
             'drill_diameter': round(drill_diameter, 3)
         }
+        if form is not None:
+            result['thread_name'] = catalog_table.katalog.names[row]
+            result['thread_form'] = {'name': form.nazev, 'angle': form.uhel, 'coefficient': round(form.koeficient, 4)}
+        if inventory is not None:
+            result['stock_drill'] = stock_drill_json(
+                inventory.snap_drill(drill_diameter, thread_diameter, thread_pitch, snap, coefficient))
+        if strengths:
+            result['drills'] = []
+            for sila in [float(s) for s in strengths]:
+                vrtak = table.drill(row, sila)
+                polozka = {'strength': sila, 'drill_diameter': round(vrtak, 3)}
+                if inventory is not None:
+                    polozka['stock_drill'] = stock_drill_json(
+                        inventory.snap_drill(vrtak, thread_diameter, thread_pitch, snap, coefficient))
+                result['drills'].append(polozka)
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e)
+        }
+    
+    return jsonify(result)
+
+@app.route('/api/tapping-drills/table', methods=['GET', 'POST'])
+def tapping_drills_table():
+    data = request.get_json(silent=True) or request.args
+    export_format = data.get('format', 'latex')
+    strengths = data.get('strengths')
+    
+    try:
+        if export_format not in EXPORTERY:
+            raise ValueError('unknown export format: ' + str(export_format))
+        if isinstance(strengths, dict):
+            strengths = mrizka_sil(int(strengths.get('from', 50)), int(strengths.get('to', 90)),
+                                   int(strengths.get('step', 1)))
+        elif isinstance(strengths, str):
+            strengths = [float(s) for s in strengths.split(',')]
+        inventory = data.get('inventory')
+        if isinstance(inventory, str) and inventory not in ('all', 'metric', 'inch'):
+            inventory = [float(v) for v in inventory.split(',')]
+        td = TappingDrills(format=export_format, sily=strengths or (60, 65, 70, 75, 80, 85),
+                           sklad=sklad_z_parametru(inventory), smer=data.get('snap'),
+                           rodina=data.get('family', 'M'))
+        DrillTable([], [], td.sily)     # kontrola sil jeste pred zacatkem streamu
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+    
+    return Response(td.export(), mimetype=EXPORTERY[export_format].mimetype)
+
+@app.route('/api/tapping-drills/report')
+def tapping_drills_report():
+    strength = request.args.get('strength', 75, type=float)
+    inventory = request.args.get('inventory', 'all')
+    snap = request.args.get('snap') or None         # prazdny parametr = bez omezeni
+    family = request.args.get('family') or None
+    
+    try:
+        if inventory not in ('all', 'metric', 'inch'):
+            inventory = [float(v) for v in inventory.split(',')]
+        report = drill_report(None, sklad_z_parametru(inventory), strength, snap)
+        families = {}
+        for rodina, radky in report.by_family().items():
+            if family is not None and rodina != family:
+                continue
+            families[rodina if rodina is not None else '?'] = [{
+                'name': radek.nazev,
+                'diameter_mm': radek.prumer,
+                'pitch_mm': radek.stoupani,
+                'theoretical_drill': round(radek.teoreticky, 3),
+                'drill': radek.vrtak.oznaceni if radek.vrtak is not None else None,
+                'drill_diameter_mm': round(radek.vrtak.prumer, 4) if radek.vrtak is not None else None,
+                'engagement': round(radek.sila, 1) if radek.sila is not None else None
+            } for radek in radky]
+        
+        result = {
+            'success': True,
+            'strength': strength,
+            'families': families
+        }
     except Exception as e:
         result = {
             'success': False,
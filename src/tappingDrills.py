@@ -6,15 +6,546 @@ Created on 05/10/2017, 13:39
 
 @author: David Potucek
 """
-from findThread import ThreadPool
+import csv
+import io
+import json
+import math
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from fractions import Fraction
+from functools import lru_cache
+
+from findThread import ThreadPool, get_catalog, parse_number
+
+try:
+    import numpy as np
+except ImportError:     # NumPy je volitelny, bez nej se sloupce pocitaji po prvcich
+    np = None
+
+KOEFICIENT_METRICKY = 1.083     # hloubka ISO metrickeho zavitu / stoupani
+
+# tvar zavitu: vrcholovy uhel [deg] a koeficient prumerove hloubky vnitrniho zavitu (2 * hloubka / stoupani),
+# vrtak = prumer - stoupani * koeficient * sila / 100
+ThreadForm = namedtuple('ThreadForm', ['nazev', 'uhel', 'koeficient'])
+
+TVARY_ZAVITU = {
+    'ISO': ThreadForm('ISO / UN', 60.0, KOEFICIENT_METRICKY),       # 2 * 5/8 H, H = 0.866 P
+    'Whitworth': ThreadForm('Whitworth', 55.0, 1.2806),             # 2 * 0.6403 P
+    'BA': ThreadForm('BA / Thury', 47.5, 1.2),                      # 2 * 0.6 P
+    'Loewenherz': ThreadForm('Loewenherz', 53.13, 1.5),             # 2 * 0.75 P
+    'CEI': ThreadForm('CEI', 60.0, 1.0654),                         # 2 * 0.5327 P
+}
+
+# rodina zavitu z legendy FINDTHRD.DAT -> tvar zavitu
+RODINY_TVARU = {'M': 'ISO', 'UNC': 'ISO', 'UNF': 'ISO', 'UNEF': 'ISO', 'ASME': 'ISO', 'SPARK': 'ISO',
+                'Whit': 'Whitworth', 'BSF': 'Whitworth', 'BSP': 'Whitworth', 'WINS': 'Whitworth',
+                'WPipe': 'Whitworth', 'ADM': 'Whitworth', 'Brass': 'Whitworth', 'GAS': 'Whitworth',
+                'BA': 'BA', 'THURY': 'BA', 'LOEW': 'Loewenherz', 'CEI': 'CEI'}
+LATEX_HLAVICKA = 'Soubor k zahrnuti do LaTeX tabulky. Use copy/paste.\n'
+
+# radek tabulky vrtaku: jadro je puvodni hodnota z katalogu (muze byt 'N/A'), vrtaky odpovidaji silam tabulky
+# skladove je None nebo tuple VrtakZeSkladu ke kazde sile
+RadekVrtaku = namedtuple('RadekVrtaku', ['nazev', 'stoupani', 'jadro', 'vrtaky', 'skladove'], defaults=(None,))
+
+# vrtak ze skladu: oznaceni ('6.8', '#7', 'F', '17/64'), prumer v mm, druh (metric, number, letter, fraction, shop)
+Drill = namedtuple('Drill', ['oznaceni', 'prumer', 'druh'])
+
+# teoreticky vrtak nahrazeny skladovym a sila zavitu, kterou skladovy vrtak skutecne da
+VrtakZeSkladu = namedtuple('VrtakZeSkladu', ['vrtak', 'teoreticky', 'sila'])
+
+# cislovane vrtaky #1 - #80 v palcich
+CISLOVANE_VRTAKY = (0.2280, 0.2210, 0.2130, 0.2090, 0.2055, 0.2040, 0.2010, 0.1990, 0.1960, 0.1935,
+                    0.1910, 0.1890, 0.1850, 0.1820, 0.1800, 0.1770, 0.1730, 0.1695, 0.1660, 0.1610,
+                    0.1590, 0.1570, 0.1540, 0.1520, 0.1495, 0.1470, 0.1440, 0.1405, 0.1360, 0.1285,
+                    0.1200, 0.1160, 0.1130, 0.1110, 0.1100, 0.1065, 0.1040, 0.1015, 0.0995, 0.0980,
+                    0.0960, 0.0935, 0.0890, 0.0860, 0.0820, 0.0810, 0.0785, 0.0760, 0.0730, 0.0700,
+                    0.0670, 0.0635, 0.0595, 0.0550, 0.0520, 0.0465, 0.0430, 0.0420, 0.0410, 0.0400,
+                    0.0390, 0.0380, 0.0370, 0.0360, 0.0350, 0.0330, 0.0320, 0.0310, 0.0292, 0.0280,
+                    0.0260, 0.0250, 0.0240, 0.0225, 0.0210, 0.0200, 0.0180, 0.0160, 0.0145, 0.0135)
+
+# pismenkove vrtaky A - Z v palcich
+PISMENKOVE_VRTAKY = (0.234, 0.238, 0.242, 0.246, 0.250, 0.257, 0.261, 0.266, 0.272, 0.277, 0.281, 0.290, 0.295,
+                     0.302, 0.316, 0.323, 0.332, 0.339, 0.348, 0.358, 0.368, 0.377, 0.386, 0.397, 0.404, 0.413)
+
+
+def kontroluj_silu(strength):
+    """Vyhodi ValueError pro silu zavitu mimo rozsah (20 - 100>."""
+    if strength <= 20 or strength > 100:
+        raise ValueError('value of the strength is out of reasonable range. Range (20 - 100>')
+
+
+def mrizka_sil(od=50, do=90, krok=1):
+    """Sily zavitu od - do vcetne s danym krokem, napr. 50 - 90 % po 1 %."""
+    return tuple(range(od, do + 1, krok))
+
+
+class DrillTable:
+    """Tabulka vrtaku zavity x sily zavitu. Sloupec jedne sily se pocita najednou pro vsechny zavity
+    (s NumPy jednim vektorovym vyrazem) az pri prvnim pristupu a pak se pamatuje. matrix() dopocita
+    chybejici sloupce celeho rastru jednou operaci."""
+
+    def __init__(self, prumery, stoupani, sily=(60, 65, 70, 75, 80, 85), nazvy=None, koeficienty=None):
+        """:param koeficienty: koeficient hloubky zavitu pro kazdy radek (viz TVARY_ZAVITU),
+        implicitne ISO metricky pro vsechny"""
+        self.prumery = array('d', prumery)
+        self.stoupani = array('d', stoupani)
+        self.koeficienty = array('d', koeficienty) if koeficienty is not None else None
+        if len(self.prumery) != len(self.stoupani) or (
+                self.koeficienty is not None and len(self.koeficienty) != len(self.prumery)):
+            raise ValueError('diameters, pitches and coefficients have to have the same length')
+        for sila in sily:
+            kontroluj_silu(sila)
+        self.sily = tuple(sily)
+        self.nazvy = tuple(nazvy) if nazvy is not None else None
+        self._sloupce = {}
+
+    @classmethod
+    def from_threads(cls, threads, sily=(60, 65, 70, 75, 80, 85)):
+        """Tabulka pro zavity (Thread, MetricThread) v danem poradi."""
+        threads = tuple(threads)
+        return cls([float(t.diaMM) for t in threads], [float(t.pitchMM) for t in threads], sily,
+                   [t.name for t in threads])
+
+    def __len__(self):
+        return len(self.prumery)
+
+    def column(self, sila):
+        """Vrtaky pro vsechny zavity pri dane sile zavitu. Pamatuji se jen sloupce sil tabulky,
+        jine sily se spocitaji pri kazdem volani (tabulka muze byt sdilena pro libovolne dotazy)."""
+        sloupec = self._sloupce.get(sila)
+        if sloupec is None:
+            kontroluj_silu(sila)
+            if np is not None:
+                vysledek = (np.frombuffer(self.prumery, dtype=float)
+                            - (np.frombuffer(self.stoupani, dtype=float) * self._koeficient_np() * sila / 100))
+                sloupec = array('d', vysledek.tobytes())
+            else:
+                koeficienty = self.koeficienty or [KOEFICIENT_METRICKY] * len(self.prumery)
+                sloupec = array('d', [d - (p * k * sila / 100)
+                                      for d, p, k in zip(self.prumery, self.stoupani, koeficienty)])
+            if sila in self.sily:
+                self._sloupce[sila] = sloupec
+        return sloupec
+
+    def _koeficient_np(self):
+        if self.koeficienty is None:
+            return KOEFICIENT_METRICKY
+        return np.frombuffer(self.koeficienty, dtype=float)
+
+    def koeficient(self, radek):
+        """Koeficient hloubky zavitu radku."""
+        return KOEFICIENT_METRICKY if self.koeficienty is None else self.koeficienty[radek]
+
+    def drill(self, radek, sila):
+        """Vrtak pro zavit na radku pri dane sile zavitu, mimo sily tabulky jen pro tento radek."""
+        if sila in self._sloupce or sila in self.sily:
+            return self.column(sila)[radek]
+        kontroluj_silu(sila)
+        return self.prumery[radek] - (self.stoupani[radek] * self.koeficient(radek) * sila / 100)
+
+    def row(self, radek):
+        """Vrtaky jednoho zavitu pro vsechny sily tabulky."""
+        return tuple(self.column(sila)[radek] for sila in self.sily)
+
+    def matrix(self):
+        """Cela matice zavity x sily jako tuple radku."""
+        chybi = [s for s in self.sily if s not in self._sloupce]
+        if chybi and np is not None:
+            sily = np.asarray(chybi, dtype=float)[None, :]
+            koeficient = self._koeficient_np()
+            if self.koeficienty is not None:
+                koeficient = koeficient[:, None]
+            vysledek = (np.frombuffer(self.prumery, dtype=float)[:, None]
+                        - (np.frombuffer(self.stoupani, dtype=float)[:, None] * koeficient * sily / 100))
+            for k, sila in enumerate(chybi):
+                self._sloupce[sila] = array('d', vysledek[:, k].tobytes())
+        sloupce = [self.column(sila) for sila in self.sily]
+        return tuple(zip(*sloupce)) if sloupce else tuple(() for _ in range(len(self)))
+
+
+def _jadro_cislo(jadro):
+    """Prumer jadra z katalogu jako float, None pokud chybi."""
+    try:
+        hodnota = parse_number(str(jadro))
+    except ValueError:
+        return None
+    return None if math.isnan(hodnota) else hodnota
+
+
+def tvar_zavitu(katalog, i):
+    """Tvar zavitu na pozici i katalogu podle rodiny. Pro rodiny bez znameho tvaru (PROG, PEND, WALTH,
+    HOLTZ...) se pouzije hloubka zavitu z katalogu, kdyz neni ani ta, ISO tvar."""
+    tvar = RODINY_TVARU.get(katalog.family_of.get(i))
+    if tvar is not None:
+        return TVARY_ZAVITU[tvar]
+    hloubka = katalog.columns['depthMM'][i]
+    if hloubka == hloubka:
+        return ThreadForm('katalog', None, 2 * hloubka / katalog.pitch_mm(i))
+    return TVARY_ZAVITU['ISO']
+
+
+class CatalogDrillTable:
+    """Tabulka vrtaku pro vsechny zavity katalogu podle jejich tvaru, cela matice se spocita hned
+    pri vytvoreni. Zavity lze hledat podle jmena."""
+
+    def __init__(self, katalog, sily=(60, 65, 70, 75, 80, 85)):
+        self.katalog = katalog
+        self.tvary = tuple(tvar_zavitu(katalog, i) for i in range(len(katalog)))
+        self.tabulka = DrillTable([katalog.diameter_mm(i) for i in range(len(katalog))],
+                                  [katalog.pitch_mm(i) for i in range(len(katalog))], sily, katalog.names,
+                                  [t.koeficient for t in self.tvary])
+        self.tabulka.matrix()
+        self._podle_jmena = {}
+        for i, nazev in enumerate(katalog.names):
+            self._podle_jmena.setdefault(' '.join(nazev.lower().split()), i)
+
+    def find(self, nazev):
+        """Pozice zavitu podle jmena (bez ohledu na velikost pismen a mezery)."""
+        i = self._podle_jmena.get(' '.join(str(nazev).lower().split()))
+        if i is None:
+            raise ValueError('unknown thread: ' + str(nazev))
+        return i
+
+    def drill(self, nazev, sila=75):
+        """Vrtak pro zavit daneho jmena a silu zavitu."""
+        return self.tabulka.drill(self.find(nazev), sila)
+
+
+def catalog_drill_table(katalog=None, sily=(60, 65, 70, 75, 80, 85)):
+    """Sdilena CatalogDrillTable, implicitne pro aktualni katalog FINDTHRD.DAT; prepocita se pro novy
+    katalog (po zmene souboru)."""
+    if katalog is None:
+        katalog = get_catalog()
+    return _catalog_drill_table(katalog, tuple(sily))
+
+
+@lru_cache(maxsize=8)
+def _catalog_drill_table(katalog, sily):
+    return CatalogDrillTable(katalog, sily)
+
+
+def skutecna_sila(prumer, stoupani, vrtak, koeficient=KOEFICIENT_METRICKY):
+    """Sila zavitu v %, kterou da vrtak daneho prumeru (inverze countTapDrill)."""
+    return (prumer - vrtak) * 100 / (stoupani * koeficient)
+
+
+def _zlomek_palce(zlomek):
+    """Oznaceni palcoveho vrtaku, napr. 17/64", 1" nebo 1 1/16" (palce)."""
+    cela, zbytek = divmod(zlomek, 1)
+    if zbytek == 0:
+        return '{}"'.format(cela)
+    return ('{} '.format(cela) if cela else '') + '{}/{}"'.format(zbytek.numerator, zbytek.denominator)
+
+
+def metricke_vrtaky(od=0.3, do=20.0, krok=0.1):
+    """Metricke vrtaky od - do vcetne s danym krokem (pocitano v setinach, bez kumulace chyby)."""
+    setiny = round(krok * 100)
+    return [Drill('{:g}'.format(k / 100), k / 100, 'metric')
+            for k in range(round(od * 100), round(do * 100) + 1, setiny)]
+
+
+def palcove_vrtaky():
+    """Cislovane #1 - #80, pismenkove A - Z a zlomkove 1/64 - 1 po 1/64 a 1 - 2 po 1/16 palce."""
+    vrtaky = [Drill('#{}'.format(i), v * 25.4, 'number') for i, v in enumerate(CISLOVANE_VRTAKY, 1)]
+    vrtaky += [Drill(chr(ord('A') + i), v * 25.4, 'letter') for i, v in enumerate(PISMENKOVE_VRTAKY)]
+    zlomky = [Fraction(i, 64) for i in range(1, 65)] + [1 + Fraction(i, 16) for i in range(1, 17)]
+    vrtaky += [Drill(_zlomek_palce(z), float(z) * 25.4, 'fraction') for z in zlomky]
+    return vrtaky
+
+
+def nacti_vrtaky(path):
+    """Vlastni seznam vrtaku dilny. Radek: 'prumer', 'oznaceni prumer' nebo 'oznaceni prumer in|mm',
+    prumer je v mm, pokud neni uvedeno in. Radky zacinajici ; jsou komentare."""
+    vrtaky = []
+    with open(path) as file:
+        for cislo, radek in enumerate(file, 1):
+            casti = radek.split()
+            if not casti or casti[0].startswith(';'):
+                continue
+            try:
+                if len(casti) == 1:
+                    vrtaky.append(Drill(casti[0], parse_number(casti[0]), 'shop'))
+                elif len(casti) in (2, 3) and (len(casti) == 2 or casti[2] in ('mm', 'in')):
+                    prumer = parse_number(casti[1]) * (25.4 if casti[2:] == ['in'] else 1)
+                    vrtaky.append(Drill(casti[0], prumer, 'shop'))
+                else:
+                    raise ValueError('expected: [label] diameter [mm|in]')
+            except ValueError as e:
+                raise ValueError('{}:{}: {}'.format(path, cislo, e))
+    return vrtaky
+
+
+class DrillInventory:
+    """Sklad vrtaku serazeny podle prumeru, nejblizsi vrtak se hleda pulenim intervalu v O(log n)."""
+
+    def __init__(self, vrtaky):
+        vrtaky = [Drill(str(v.oznaceni), float(v.prumer), v.druh) for v in vrtaky]
+        for v in vrtaky:
+            if not 0 < v.prumer < math.inf:
+                raise ValueError('drill diameter has to be positive: ' + repr(v))
+        self.vrtaky = tuple(sorted(vrtaky, key=lambda v: v.prumer))
+        self.prumery = tuple(v.prumer for v in self.vrtaky)
+
+    @classmethod
+    def standard(cls, metric=True, inch=True, vlastni=()):
+        """Metricke vrtaky 0.3 - 20 mm po 0.1 a 20.5 - 50 mm po 0.5, palcove (cislovane, pismenkove,
+        zlomkove) a vlastni seznam dilny."""
+        vrtaky = list(vlastni)
+        if metric:
+            vrtaky += metricke_vrtaky() + metricke_vrtaky(20.5, 50.0, 0.5)
+        if inch:
+            vrtaky += palcove_vrtaky()
+        return cls(vrtaky)
+
+    def __len__(self):
+        return len(self.vrtaky)
+
+    def nearest(self, prumer, smer=None):
+        """Skladovy vrtak nejblizsi k prumeru. smer 'down' = nejvetsi nejvyse prumer (silnejsi zavit),
+        'up' = nejmensi alespon prumer, None = nejblizsi. None pokud takovy vrtak neni."""
+        if smer not in (None, 'down', 'up'):
+            raise ValueError("expected direction down, up or None, got: " + str(smer))
+        return self._vyber(bisect_left(self.prumery, prumer), prumer, smer)
+
+    def _vyber(self, i, prumer, smer):
+        """Vrtak pro prumer, kdyz i je pozice prumeru v self.prumery (bisect_left)."""
+        if i < len(self.prumery) and self.prumery[i] == prumer:
+            return self.vrtaky[i]
+        mensi = self.vrtaky[i - 1] if i > 0 else None
+        vetsi = self.vrtaky[i] if i < len(self.vrtaky) else None
+        if smer == 'down':
+            return mensi
+        if smer == 'up':
+            return vetsi
+        if mensi is None or (vetsi is not None and vetsi.prumer - prumer < prumer - mensi.prumer):
+            return vetsi
+        return mensi
+
+    def snap(self, prumer, stoupani, sila=75, smer=None, koeficient=KOEFICIENT_METRICKY):
+        """Teoreticky vrtak pro zavit nahradi skladovym a spocita skutecnou silu zavitu."""
+        teoreticky = prumer - (stoupani * koeficient * sila / 100)
+        return self.snap_drill(teoreticky, prumer, stoupani, smer, koeficient)
+
+    def snap_drill(self, teoreticky, prumer, stoupani, smer=None, koeficient=KOEFICIENT_METRICKY):
+        """Jako snap(), ale pro uz spocitany teoreticky vrtak."""
+        vrtak = self.nearest(teoreticky, smer)
+        if vrtak is None:
+            return None
+        return VrtakZeSkladu(vrtak, teoreticky, skutecna_sila(prumer, stoupani, vrtak.prumer, koeficient))
+
+    def nearest_sorted(self, prumery, smer=None):
+        """nearest() pro vzestupne serazene prumery jednim pruchodem (merge join), O(len(prumery) + n)."""
+        if smer not in (None, 'down', 'up'):
+            raise ValueError("expected direction down, up or None, got: " + str(smer))
+        vysledek = []
+        j = 0
+        for prumer in prumery:
+            while j < len(self.prumery) and self.prumery[j] < prumer:
+                j += 1
+            vysledek.append(self._vyber(j, prumer, smer))
+        return vysledek
+
+
+@lru_cache(maxsize=None)
+def standardni_sklad(metric=True, inch=True):
+    """Sdileny standardni sklad vrtaku, viz DrillInventory.standard."""
+    return DrillInventory.standard(metric, inch)
+
+
+# radek prehledu vrtaku katalogu: vrtak je skladovy Drill (None pokud ve skladu neni), sila je skutecna sila zavitu
+VrtakZavitu = namedtuple('VrtakZavitu', ['nazev', 'rodina', 'prumer', 'stoupani', 'teoreticky', 'vrtak', 'sila'])
+
+
+class DrillReport:
+    """Nejlepsi skladovy vrtak pro kazdy zavit katalogu (metricke i palcove). Teoreticke vrtaky
+    podle tvaru zavitu jsou sloupcem CatalogDrillTable, seradi se a se skladem se spoji jednim pruchodem."""
+
+    def __init__(self, katalog, sklad, sila=75, smer=None):
+        self.katalog = katalog
+        self.sklad = sklad
+        self.sila = sila
+        self.smer = smer
+        tabulka = catalog_drill_table(katalog).tabulka
+        prumery, stoupani, koeficienty = tabulka.prumery, tabulka.stoupani, tabulka.koeficienty
+        teoreticke = tabulka.column(sila)
+        poradi = sorted((i for i, v in enumerate(teoreticke) if v == v), key=teoreticke.__getitem__)
+        vrtaky = [None] * len(teoreticke)
+        for i, vrtak in zip(poradi, sklad.nearest_sorted([teoreticke[i] for i in poradi], smer)):
+            vrtaky[i] = vrtak
+        radky = []
+        for i, vrtak in enumerate(vrtaky):
+            skutecna = None if vrtak is None else skutecna_sila(prumery[i], stoupani[i], vrtak.prumer, koeficienty[i])
+            radky.append(VrtakZavitu(katalog.names[i], katalog.family_of[i], prumery[i], stoupani[i],
+                                     teoreticke[i], vrtak, skutecna))
+        self.radky = tuple(radky)
+
+    def by_family(self):
+        """Radky rozdelene podle rodiny zavitu (kod z legendy katalogu), v poradi katalogu."""
+        return {rodina: tuple(self.radky[i] for i in pozice) for rodina, pozice in self.katalog.families.items()}
+
+
+def drill_report(katalog=None, sklad=None, sila=75, smer=None):
+    """Sdileny DrillReport, implicitne pro aktualni katalog FINDTHRD.DAT a standardni sklad. Katalog se
+    zjisti pri kazdem volani, get_catalog vraci po zmene souboru novy objekt a prehled se tak prepocita."""
+    if katalog is None:
+        katalog = get_catalog()
+    if sklad is None:
+        sklad = standardni_sklad()
+    return _drill_report(katalog, sklad, sila, smer)
+
+
+@lru_cache(maxsize=32)
+def _drill_report(katalog, sklad, sila, smer):
+    return DrillReport(katalog, sklad, sila, smer)
+
+
+def sklad_z_parametru(inventar):
+    """Sklad vrtaku z parametru pozadavku: None/False bez skladu, True/'all' standardni sklad,
+    'metric' nebo 'inch' jen cast standardniho skladu, seznam = vlastni vrtaky dilny
+    (prumery v mm nebo dvojice [oznaceni, prumer v mm])."""
+    if inventar is None or inventar is False:
+        return None
+    if inventar is True or inventar == 'all':
+        return standardni_sklad()
+    if inventar == 'metric':
+        return standardni_sklad(inch=False)
+    if inventar == 'inch':
+        return standardni_sklad(metric=False)
+    if isinstance(inventar, (list, tuple)):
+        vrtaky = []
+        for v in inventar:
+            if isinstance(v, (list, tuple)):
+                vrtaky.append(Drill(str(v[0]), float(v[1]), 'shop'))
+            else:
+                vrtaky.append(Drill('{:g}'.format(float(v)), float(v), 'shop'))
+        return DrillInventory(vrtaky)
+    raise ValueError('unknown drill inventory: ' + str(inventar))
+
+
+def _skladovy(vyber, format_bunky):
+    """Text bunky pro skladovy vrtak, prazdny retezec pokud ve skladu neni."""
+    return '' if vyber is None else format_bunky(vyber)
+
+
+class LatexExporter:
+    """Radky pro LaTeX tabulku, format puvodniho generate_output. Se skladem jsou v bunkach
+    oznaceni skladovych vrtaku misto teoretickych prumeru."""
+    mimetype = 'text/plain'
+
+    def header(self, sily, sklad=False):
+        return LATEX_HLAVICKA
+
+    def row(self, radek):
+        if radek.skladove is None:
+            bunky = ['{:.2f}'.format(v) for v in radek.vrtaky]
+        else:
+            bunky = [_skladovy(v, lambda v: v.vrtak.oznaceni) for v in radek.skladove]
+        return ('{} & {:.2f} & {} & '.format(radek.nazev, float(radek.stoupani), radek.jadro)
+                + ' & '.join(bunky) + '\\\\\\\\\n')
+
+
+class CsvExporter:
+    """Se skladem ma kazda sila navic sloupce stock_<sila> (oznaceni) a engagement_<sila> (skutecna sila)."""
+    mimetype = 'text/csv'
+
+    def _radek(self, hodnoty):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow(hodnoty)
+        return buffer.getvalue()
+
+    def header(self, sily, sklad=False):
+        sloupce = ['name', 'pitch_mm', 'core_mm'] + ['drill_{:g}'.format(s) for s in sily]
+        if sklad:
+            for s in sily:
+                sloupce += ['stock_{:g}'.format(s), 'engagement_{:g}'.format(s)]
+        return self._radek(sloupce)
+
+    def row(self, radek):
+        jadro = _jadro_cislo(radek.jadro)
+        hodnoty = [radek.nazev, float(radek.stoupani), '' if jadro is None else jadro] + [round(v, 3) for v in radek.vrtaky]
+        for v in radek.skladove or ():
+            hodnoty += ['', ''] if v is None else [v.vrtak.oznaceni, round(v.sila, 1)]
+        return self._radek(hodnoty)
+
+
+class MarkdownExporter:
+    """Se skladem je v bunce teoreticky vrtak, skladovy vrtak a skutecna sila zavitu."""
+    mimetype = 'text/markdown'
+
+    def header(self, sily, sklad=False):
+        sloupce = ['Zavit', 'Stoupani [mm]', 'Jadro [mm]'] + ['{:g} %'.format(s) for s in sily]
+        return '| ' + ' | '.join(sloupce) + ' |\n' + '|' + '---|' * len(sloupce) + '\n'
+
+    def row(self, radek):
+        jadro = _jadro_cislo(radek.jadro)
+        bunky = [radek.nazev, '{:.2f}'.format(float(radek.stoupani)), '' if jadro is None else '{:.3f}'.format(jadro)]
+        if radek.skladove is None:
+            bunky += ['{:.2f}'.format(v) for v in radek.vrtaky]
+        else:
+            bunky += ['{:.2f}'.format(v) + _skladovy(s, lambda s: ' → {} ({:.0f} %)'.format(s.vrtak.oznaceni, s.sila))
+                      for v, s in zip(radek.vrtaky, radek.skladove)]
+        return '| ' + ' | '.join(bunky) + ' |\n'
+
+
+class JsonLinesExporter:
+    mimetype = 'application/x-ndjson'
+
+    def __init__(self):
+        self.sily = ()
+
+    def header(self, sily, sklad=False):
+        self.sily = tuple(sily)
+        return ''
+
+    def row(self, radek):
+        zaznam = {'name': radek.nazev, 'pitch_mm': float(radek.stoupani), 'core_mm': _jadro_cislo(radek.jadro),
+                  'drills': {'{:g}'.format(s): round(v, 3) for s, v in zip(self.sily, radek.vrtaky)}}
+        if radek.skladove is not None:
+            zaznam['stock'] = {'{:g}'.format(s): None if v is None else
+                               {'drill': v.vrtak.oznaceni, 'diameter_mm': round(v.vrtak.prumer, 4),
+                                'kind': v.vrtak.druh, 'engagement': round(v.sila, 1)}
+                               for s, v in zip(self.sily, radek.skladove)}
+        return json.dumps(zaznam, ensure_ascii=False) + '\n'
+
+
+EXPORTERY = {'latex': LatexExporter, 'csv': CsvExporter, 'markdown': MarkdownExporter, 'jsonl': JsonLinesExporter}
+
+
+def export_rows(radky, format='latex', sily=(60, 65, 70, 75, 80, 85), sklad=False):
+    """Generator textu tabulky vrtaku: hlavicka a pak kazdy RadekVrtaku naformatovany jednou.
+    :param radky: iterable RadekVrtaku
+    :param format: latex, csv, markdown nebo jsonl (klic EXPORTERY)
+    :param sklad: radky obsahuji skladove vrtaky (sloupce navic v hlavicce)"""
+    if format not in EXPORTERY:
+        raise ValueError('unknown export format: ' + str(format) + ', expected one of ' + ', '.join(EXPORTERY))
+    exporter = EXPORTERY[format]()
+    hlavicka = exporter.header(sily, sklad)
+    if hlavicka:
+        yield hlavicka
+    for radek in radky:
+        yield exporter.row(radek)
 
 
 class TappingDrills:
     """Trida pro vypocty vrtaku pro zavity."""
     
-    def __init__(self, output_file='/home/david/Downloads/ThreadOutput.txt', debug=False):
+    def __init__(self, output_file='/home/david/Downloads/ThreadOutput.txt', debug=False, format='latex',
+                 sily=(60, 65, 70, 75, 80, 85), sklad=None, smer=None, rodina='M'):
+        """:param sklad: DrillInventory, pokud je zadan, tabulka obsahuje i skladove vrtaky
+        :param smer: smer zaokrouhleni na skladovy vrtak (None, 'down', 'up'), viz DrillInventory.nearest
+        :param rodina: rodina zavitu z legendy katalogu (M, UNC, BSF, Whit, BA...)"""
         self.output_file = output_file
         self.debug = debug
+        self.format = format
+        self.sily = tuple(sily)
+        if smer not in (None, 'down', 'up'):
+            raise ValueError("expected direction down, up or None, got: " + str(smer))
+        self.sklad = sklad
+        self.smer = smer
+        if rodina != 'M' and rodina not in get_catalog().families:
+            raise ValueError('unknown thread family: ' + str(rodina))
+        self.rodina = rodina
         
     def test_count_drill(self):
         print('test spravnosti funkce')
@@ -26,27 +557,36 @@ class TappingDrills:
         print('spravny vysledek je: 3.55 mm')
         
     def put_header(self, file):
-        file.write('Soubor k zahrnuti do LaTeX tabulky. Use copy/paste.\n')
+        file.write(LATEX_HLAVICKA)
+
+    def rows(self):
+        """Generator RadekVrtaku pro zavity rodiny (implicitne metricke) serazene podle prumeru."""
+        if self.rodina == 'M':
+            depth_threads = sorted(MetricThread(t) for t in ThreadPool().list_metric_threads())
+            tabulka = DrillTable.from_threads(depth_threads, self.sily)
+        else:
+            katalog = get_catalog()
+            pozice = sorted(katalog.families[self.rodina], key=katalog.diameter_mm)
+            depth_threads = [katalog.threads[i] for i in pozice]
+            tabulka = DrillTable([katalog.diameter_mm(i) for i in pozice], [katalog.pitch_mm(i) for i in pozice],
+                                 self.sily, koeficienty=[tvar_zavitu(katalog, i).koeficient for i in pozice])
+        for radek, (d, vrtaky) in enumerate(zip(depth_threads, tabulka.matrix())):
+            skladove = None
+            if self.sklad is not None:
+                skladove = tuple(self.sklad.snap_drill(v, tabulka.prumery[radek], tabulka.stoupani[radek], self.smer,
+                                                       tabulka.koeficient(radek)) for v in vrtaky)
+            yield RadekVrtaku(d.name, d.pitchMM, d.coreMM, vrtaky, skladove)
+
+    def export(self, format=None):
+        """Generator textu tabulky v danem formatu (implicitne self.format)."""
+        return export_rows(self.rows(), format or self.format, self.sily, self.sklad is not None)
         
     def generate_output(self):
-        pool = ThreadPool()
-        metric = pool.list_metric_threads()
-        depth_threads = []
-        for t in metric:
-            depth_threads.append(MetricThread(t))
-
-        depth_threads.sort()
         with open(self.output_file, 'w+') as file:
-            self.put_header(file)
-            for d in depth_threads:
+            for kus in self.export():
                 if self.debug:
-                    print('{} & {:.2f} & {} & {:.2f} & {:.2f} & {:.2f} & {:.2f} & {:.2f} & {:.2f}\\\\\\\\'.format(d.name,
-                        float(d.pitchMM), d.coreMM, float(d.getDrill(60)), float(d.getDrill(65)),
-                        float(d.getDrill(70)), float(d.getDrill(75)), float(d.getDrill(80)), float(d.getDrill(85))))
-
-                file.write('{} & {:.2f} & {} & {:.2f} & {:.2f} & {:.2f} & {:.2f} & {:.2f} & {:.2f}\\\\\\\\\n'.format(d.name,
-                    float(d.pitchMM), d.coreMM, float(d.getDrill(60)), float(d.getDrill(65)),
-                    float(d.getDrill(70)), float(d.getDrill(75)), float(d.getDrill(80)), float(d.getDrill(85))))
+                    print(kus, end='')
+                file.write(kus)
             print('file {} written!'.format(self.output_file))
 
 
@@ -55,7 +595,6 @@ class MetricThread:
     sily = (60, 65, 70, 75, 80, 85)
 
     def __init__(self, thread):
-        self.vrtaky = []
         self.thread = thread
         self.name = thread.name
         self.diaInch = thread.diaInch
@@ -66,25 +605,22 @@ class MetricThread:
         self.coreMM = thread.coreMM
         self.depthInch = thread.depthInch
         self.depthMM = thread.depthMM
-        self.vrtaky = [self.countTapDrill(thread.diaMM, thread.pitchMM, s) for s in self.sily]
+        self._tabulka = None
+
+    @property
+    def tabulka(self):
+        """Jednoradkova tabulka vrtaku, sloupce se pocitaji az pri prvnim dotazu."""
+        if self._tabulka is None:
+            self._tabulka = DrillTable([self.thread.diaMM], [self.thread.pitchMM], self.sily, [self.name])
+        return self._tabulka
+
+    @property
+    def vrtaky(self):
+        return list(self.tabulka.row(0))
 
     def getDrill(self, strength):
-        if strength <= 20 or strength > 100:
-            raise ValueError('value of the strength is out of reasonable range. Range (20 - 100>')
-        if strength == 60:
-            return self.vrtaky[0]
-        elif strength == 65:
-            return self.vrtaky[1]
-        elif strength == 70:
-            return self.vrtaky[2]
-        elif strength == 75:
-            return self.vrtaky[3]
-        elif strength == 80:
-            return self.vrtaky[4]
-        elif strength == 85:
-            return self.vrtaky[5]
-        else:
-            return self.countTapDrill(self.thread.diaMM, self.thread.pitchMM, strength)
+        kontroluj_silu(strength)
+        return self.tabulka.drill(0, strength)
 
     def countTapDrill(self, prumer, stoupani, procenta=75):
         """spocita prumer vrtaku pro dany prumer, stoupani a pokud je dodan tak procento sily
@@ -96,13 +632,13 @@ class MetricThread:
 
         Nedoporucuje se jit nad 80%, standardne jsou zavity delany na 75%
         """
-        dia = prumer - (stoupani * 1.083 * procenta / 100)
+        dia = prumer - (stoupani * KOEFICIENT_METRICKY * procenta / 100)
         return dia
 
     @staticmethod
     def countTapDrillSingle(prumer, stoupani, procenta=75):
         """Stejna metoda jako countTapDrill(), ale urcena k pouziti bez konstrukce objektu MetricThread."""
-        dia = prumer - (stoupani * 1.083 * procenta / 100)
+        dia = prumer - (stoupani * KOEFICIENT_METRICKY * procenta / 100)
         return dia
 
     def __lt__(self, other):
@@ -114,5 +650,7 @@ def putHeader(file):
 
 
 if __name__ == "__main__":
-    td = TappingDrills()
+    import sys
+    # volitelne: tappingDrills.py [vystupni soubor] [latex|csv|markdown|jsonl]
+    td = TappingDrills(*sys.argv[1:2], format=sys.argv[2] if len(sys.argv) > 2 else 'latex')
     td.generate_output()
\ No newline at end of file
@@ -5,10 +5,11 @@ Unit tests for deleni module.
 """
 
 import unittest
+from fractions import Fraction
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
-from deleni import DeliciHlava, prozkoumej_deleni, vypocti_pocet_der
+from deleni import DeliciHlava, IndexDeleni, prozkoumej_deleni, vypocti_pocet_der
 
 
 class TestDeleni(unittest.TestCase):
@@ -38,6 +39,31 @@ class TestDeleni(unittest.TestCase):
         self.assertEqual(len(result), 15)
         self.assertTrue(all(isinstance(x, int) for x in result))
 
+    def test_prozkoumej_deleni_ordering(self):
+        # Use case 1: Descending order, largest division first
+        result = self.hlava.prozkoumej_deleni(24)
+        self.assertEqual(result[0], 960)
+        self.assertEqual(result[-1], 2)
+        self.assertEqual(list(result), sorted(result, reverse=True))
+
+        # Use case 2: Rotary table ratio
+        stul = DeliciHlava(40, 120)
+        stul.ratio = stul.ratio_table
+        result = stul.prozkoumej_deleni(66)
+        self.assertEqual(result[0], 7920)
+        self.assertIn(360, result)
+        self.assertTrue(all(7920 % x == 0 for x in result))
+
+        # Use case 3: Degenerate inputs
+        self.assertEqual(self.hlava.prozkoumej_deleni(0), ())
+        self.assertEqual(DeliciHlava(40.5).prozkoumej_deleni(43), ())
+
+        # Use case 4: Decimal ratio is taken as written, not as its binary float value
+        self.assertEqual(DeliciHlava(40.1).prozkoumej_deleni(10), (401,))
+        self.assertEqual(DeliciHlava(37.3).prozkoumej_deleni(10), (373,))
+        self.assertIn(26, DeliciHlava(5.2).prozkoumej_deleni(5))
+        self.assertEqual(DeliciHlava(40.1)._krok_klikou(401), Fraction(1, 10))
+
     def test_vypocti_pocet_der_class(self):
         # Original use cases
         self.assertEqual(self.hlava.vypocti_pocet_der(40), 1)
@@ -54,6 +80,184 @@ class TestDeleni(unittest.TestCase):
         self.assertEqual(self.hlava.vypocti_pocet_der(30), 3)
         self.assertEqual(self.hlava.vypocti_pocet_der(60), 3)
 
+    def test_vypocti_pocet_der_exact(self):
+        # Use case 1: Divisions the float loop missed because of rounding
+        self.assertEqual(self.hlava.vypocti_pocet_der(77), 77)
+        self.assertEqual(self.hlava.vypocti_pocet_der(245), 49)
+
+        # Use case 2: Rotary table ratio
+        self.assertEqual(self.hlava.vypocti_pocet_der(7, use_table=True), 7)
+        self.assertEqual(self.hlava.vypocti_pocet_der(9, use_table=True), 3)
+
+        # Use case 3: Beyond the hole limit
+        self.assertEqual(self.hlava.vypocti_pocet_der(151), 0)
+
+    def test_planuj_deleni(self):
+        # Use case 1: Division 17 on 34 and 51 hole circles
+        plany = self.hlava.planuj_deleni(17)
+        self.assertIn(('diry', 34, 2, 12), plany)
+        self.assertIn(('diry2', 51, 2, 18), plany)
+        self.assertIn(('diry_cina_2', 51, 2, 18), plany)
+        self.assertEqual(len(plany), 3)
+
+        # Use case 2: Every plan sets exactly ratio / deleni turns
+        for plan in self.hlava.planuj_deleni(28):
+            self.assertEqual((plan.otacky * plan.kruh + plan.diry) * 28, 40 * plan.kruh)
+
+        # Use case 3: Unreachable prime
+        self.assertEqual(self.hlava.planuj_deleni(127), ())
+
+        # Use case 4: Batch planning
+        plany = self.hlava.planuj_vice([17, 40, 127])
+        self.assertEqual(set(plany), {17, 40, 127})
+        self.assertTrue(all(plan.otacky == 1 and plan.diry == 0 for plan in plany[40]))
+
+    def test_index_deleni(self):
+        index = IndexDeleni(self.hlava, max_deleni=400)
+
+        # Use case 1: Same plans as direct planning, both ratios
+        for deleni in (1, 17, 28, 127, 360, 399, 500):
+            self.assertEqual(index.plany(deleni, 40.0), self.hlava.planuj_deleni(deleni))
+            self.assertEqual(index.plany(deleni, 120), self.hlava.planuj_deleni(deleni, use_table=True))
+
+        # Use case 2: Reverse queries
+        nedosazitelna = index.nedosazitelna(40.0)
+        self.assertIn(127, nedosazitelna)
+        self.assertNotIn(17, nedosazitelna)
+        self.assertEqual(set(nedosazitelna) | set(index.dosazitelna(40.0)), set(range(1, 401)))
+
+        # Use case 3: Single plate and intersection of plates
+        self.assertNotIn(17, index.dosazitelna(40.0, ['diry_cina_1']))
+        self.assertIn(17, index.spolecna(40.0, ['diry'], ['diry2']))
+
+        # Use case 4: Divisions of one circle
+        self.assertEqual(index.deleni_pro_kruh(24, 40.0), self.hlava.prozkoumej_deleni(24))
+        for kruhy in self.hlava.kotouce().values():
+            for kruh in kruhy:
+                self.assertEqual(index.deleni_pro_kruh(kruh, 40.0), self.hlava.prozkoumej_deleni(kruh))
+        velikost = len(index._deleni)
+        self.assertEqual(index.deleni_pro_kruh(1234, 40.0), self.hlava.prozkoumej_deleni(1234))
+        self.assertEqual(len(index._deleni), velikost)
+
+    def test_diferencialni_deleni(self):
+        # Use case 1: Prime 127 on auxiliary division 125
+        plan = self.hlava.diferencialni_deleni(127)
+        self.assertEqual(plan.pomocne_deleni, 125)
+        self.assertEqual((plan.hnaci, plan.hnana), ((64,), (100,)))
+        self.assertEqual(plan.smer, 'opacny')
+        self.assertEqual(plan.mezikola, 2)
+
+        # Use case 2: Gear ratio matches ratio * (A - N) / A exactly
+        for deleni in (127, 131, 137, 251, 382):
+            plan = self.hlava.diferencialni_deleni(deleni)
+            self.assertIsNotNone(plan)
+            prevod = Fraction(1)
+            for hnaci, hnana in zip(plan.hnaci, plan.hnana):
+                prevod *= Fraction(hnaci, hnana)
+            self.assertEqual(prevod, abs(Fraction(40 * (plan.pomocne_deleni - deleni), plan.pomocne_deleni)))
+            self.assertTrue(self.hlava.planuj_deleni(plan.pomocne_deleni))
+
+        # Use case 3: Auxiliary plan sets the auxiliary division
+        plan = self.hlava.diferencialni_deleni(131)
+        self.assertEqual(Fraction(plan.otacky * plan.kruh + plan.diry, plan.kruh),
+                         Fraction(40, plan.pomocne_deleni))
+
+        # Use case 4: Batch sweep
+        plany = self.hlava.diferencialni_vice(range(100, 200))
+        self.assertTrue(all(plan is not None for plan in plany.values()))
+
+    def test_uhlove_deleni(self):
+        # Use case 1: Exact angles
+        plan = self.hlava.uhlove_deleni(9)
+        self.assertEqual((plan.otacky, plan.diry, plan.chyba), (1, 0, 0.0))
+        plan = self.hlava.uhlove_deleni(10)
+        self.assertEqual(Fraction(plan.otacky * plan.kruh + plan.diry, plan.kruh), Fraction(40, 36))
+        self.assertEqual(plan.chyba, 0.0)
+
+        # Use case 2: 7 deg 23 min needs an approximation
+        plan = self.hlava.uhlove_deleni(7, 23)
+        self.assertEqual((plan.kruh, plan.otacky, plan.diry), (39, 0, 32))
+        self.assertAlmostEqual(plan.chyba, 4.615, places=3)
+
+        # Use case 3: Rotary table
+        plan = self.hlava.uhlove_deleni(7, 23, use_table=True)
+        self.assertEqual((plan.kruh, plan.otacky, plan.diry), (39, 2, 18))
+
+        # Use case 4: No circle beats the chosen one
+        for stupne, minuty, sekundy in ((1, 1, 1), (33, 17, 0), (271, 59, 30)):
+            plan = self.hlava.uhlove_deleni(stupne, minuty, sekundy)
+            otacky = Fraction(stupne * 3600 + minuty * 60 + sekundy, 3600) * 40 / 360
+            for kruhy in self.hlava.kotouce().values():
+                for kruh in kruhy:
+                    chyba = abs(Fraction(round(otacky * kruh), kruh) - otacky) * 32400
+                    self.assertLessEqual(abs(plan.chyba), chyba + 1e-9)
+
+    def test_tabulka_uhlu(self):
+        # Use case 1: Every arc minute on the rotary table
+        tabulka = self.hlava.tabulka_uhlu()
+        self.assertEqual(len(tabulka), 21600)
+        self.assertEqual(tabulka[0].chyba, 0.0)
+        self.assertEqual(tabulka[60], self.hlava.uhlove_deleni(1, use_table=True))
+        self.assertTrue(all(abs(plan.chyba) <= 60 for plan in tabulka))
+
+        # Use case 2: Coarser step on the dividing head
+        tabulka = self.hlava.tabulka_uhlu(3600, use_table=False)
+        self.assertEqual(len(tabulka), 360)
+        self.assertEqual(tabulka[9].otacky, 1)
+
+    def test_sekvence_deleni(self):
+        # Use case 1: Exact division 17 on the 34 hole circle
+        kroky = list(self.hlava.sekvence_deleni(17))
+        self.assertEqual(len(kroky), 17)
+        self.assertEqual(kroky[0][1:4], (2, 12, 13))
+        self.assertEqual((kroky[-1].poloha_otacky, kroky[-1].poloha_diry), (40, 0))
+        self.assertTrue(all(krok.chyba == 0.0 for krok in kroky))
+
+        # Use case 2: Approximated prime, error does not accumulate
+        kroky = list(self.hlava.sekvence_deleni(127))
+        self.assertEqual(len(kroky), 127)
+        self.assertEqual(kroky[-1].chyba, 0.0)
+        self.assertTrue(all(abs(krok.chyba) <= 32400 / 66 / 2 for krok in kroky))
+
+        # Use case 3: Lazy generator on the rotary table
+        kroky = self.hlava.sekvence_deleni(3600, use_table=True)
+        self.assertFalse(isinstance(kroky, (list, tuple)))
+        prvni = next(kroky)
+        self.assertEqual((prvni.otacky, prvni.diry), (0, 1))
+
+        # Use case 4: Chosen circle
+        kroky = list(self.hlava.sekvence_deleni(28, kruh=42))
+        self.assertEqual(kroky[0][1:3], (1, 18))
+
+        # Use case 5: Invalid arguments fail on the call, before any step is generated
+        for deleni, kruh in ((0, None), (-5, None), (17, 0), (17, -34)):
+            with self.assertRaises(ValueError):
+                self.hlava.sekvence_deleni(deleni, kruh=kruh)
+
+    def test_navrhni_kotouce(self):
+        # Use case 1: Every division 2-100 on three plates
+        navrh = self.hlava.navrhni_kotouce(range(2, 101), pocet_kotoucu=3)
+        self.assertEqual(navrh.nepokryta, ())
+        self.assertLessEqual(len(navrh.kotouce), 3)
+        self.assertTrue(all(len(kotouc) <= 11 for kotouc in navrh.kotouce))
+        self.hlava.diry, self.hlava.diry2, self.hlava.diry_cina_1 = navrh.kotouce
+        self.hlava.diry_cina_2 = ()
+        self.assertTrue(all(self.hlava.planuj_deleni(deleni) for deleni in range(2, 101)))
+
+        # Use case 2: Minimal set for a small target
+        navrh = DeliciHlava().navrhni_kotouce((6, 7, 9), kandidati=range(15, 40))
+        self.assertEqual(len(navrh.kotouce[0]), 2)
+        self.assertIn(21, navrh.kotouce[0])
+
+        # Use case 3: Primes beyond the largest candidate are reported
+        navrh = DeliciHlava().navrhni_kotouce(list(range(2, 201)) + [211, 223], pocet_kotoucu=4)
+        self.assertIn(211, navrh.nepokryta)
+        self.assertNotIn(200, navrh.nepokryta)
+
+        # Use case 4: Too few plates
+        with self.assertRaises(ValueError):
+            DeliciHlava().navrhni_kotouce(range(2, 101), pocet_kotoucu=1)
+
     def test_prozkoumej_deleni_function(self):
         # Use case 1: Standard hole count
         result = prozkoumej_deleni(43, 40)
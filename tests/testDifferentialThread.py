@@ -8,8 +8,13 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
 Unit tests for differentialThread module.
 """
 
+import math
+import shutil
+import tempfile
 import unittest
-from differentialThread import DifferentialThread, calculate_diff_thread, parse_data, vyzkousej_kombinace
+from differentialThread import (DifferentialThread, PitchPairTable, calculate_diff_thread, calculate_diff_thread_array,
+                                get_inventory, pair_table, parse_data, pitch_matrix, read_inventory_lines,
+                                vyzkousej_kombinace)
 
 
 class TestDifferentialThread(unittest.TestCase):
@@ -108,6 +113,170 @@ class TestDifferentialThread(unittest.TestCase):
         self.assertEqual(len(result), 3)
         self.assertAlmostEqual(result[2], 5.0, places=1)
 
+    def test_pitch_pair_table(self):
+        values = (1.0, 1.25, 1.5, 2.0)
+        table = PitchPairTable(values)
+
+        # Use case 1: Every coarse/fine pair, sorted by effective pitch
+        self.assertEqual(len(table), 6)
+        self.assertEqual(list(table.pitches), sorted(table.pitches))
+
+        # Use case 2: Same best match as the full double loop
+        for cislo in (2.8, 3.5, 5.0, 5.2, 6.0, 8.0, 100.0):
+            best = min(abs(cislo - calculate_diff_thread(c, f)) for c in values for f in values if c > f)
+            self.assertAlmostEqual(abs(cislo - table.nearest(cislo)[2]), best)
+
+        # Use case 3: Tie goes to the pair found last by the double loop
+        self.assertEqual(PitchPairTable((1.0, 2.0, 4.0)).nearest(3.0), (2.0, 1.0, 2.0))
+
+        # Use case 4: Cached per inventory, rebuilt for a changed one
+        self.assertIs(pair_table(values), pair_table(values))
+        self.assertIsNot(pair_table(values), pair_table(values + (3.0,)))
+        self.assertEqual(PitchPairTable((1.0,)).nearest(2.0), [])
+
+    def test_nejblizsi_kombinace(self):
+        tpi = (16.0, 18.0, 20.0, 24.0)
+        mm = (1.0, 1.25, 1.5, 2.0)
+
+        # Use case 1: First result is the single best match
+        result = self.dt.nejblizsi_kombinace(3.5, tpi, mm, 'mm', k=3)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(tuple(result[0]), tuple(self.dt.vyzkousej_kombinace(3.5, tpi, mm, 'mm')))
+
+        # Use case 2: Ranked by deviation
+        odchylky = [abs(3.5 - r[2]) for r in result]
+        self.assertEqual(odchylky, sorted(odchylky))
+
+        # Use case 3: k larger than the pair count
+        self.assertEqual(len(self.dt.nejblizsi_kombinace(3.5, tpi, mm, 'mm', k=100)), 6)
+
+        # Use case 4: Pairs with equal effective pitch rank like nearest on both sides
+        table = PitchPairTable((1.5, 2.0, 3.0, 6.0))
+        for cislo in (2.0, 2.5, 3.0, 3.1, 5.9, 6.0, 6.1):
+            self.assertEqual(table.k_nearest(cislo, 1)[0], table.nearest(cislo))
+        tpi_vse, mm_vse = get_inventory().get()
+        table = pair_table(tuple(mm_vse))
+        for cislo in (0.857, 1.0, 2.0, 4.0):
+            self.assertEqual(table.k_nearest(cislo, 1)[0], table.nearest(cislo))
+
+    def test_kombinace_v_toleranci(self):
+        tpi = (16.0, 18.0, 20.0, 24.0)
+        mm = (1.0, 1.25, 1.5, 2.0)
+
+        # Use case 1: Band around 3.2 holds 3.0 and 3.333
+        result = self.dt.kombinace_v_toleranci(3.2, 0.25, tpi, mm, 'mm')
+        self.assertEqual([(r[0], r[1]) for r in result], [(2.0, 1.25), (1.5, 1.0)])
+
+        # Use case 2: Empty band
+        self.assertEqual(self.dt.kombinace_v_toleranci(50.0, 1.0, tpi, mm, 'mm'), [])
+
+        # Use case 3: Inch units
+        result = self.dt.kombinace_v_toleranci(130.0, 25.0, tpi, mm, 'in')
+        self.assertEqual([(r[0], r[1]) for r in result], [(24.0, 20.0), (18.0, 16.0)])
+
+    def test_slozeny_zavit(self):
+        mm = (0.75, 0.8, 1.0, 1.25, 1.5, 2.0)
+
+        # Use case 1: Two single-start threads reproduce the plain differential screw
+        result = self.dt.slozeny_zavit(6.0, (), mm, max_starts=1, prvku=2)
+        self.assertEqual(sorted(p[0] for p in result.prvky), [1.5, 2.0])
+        self.assertAlmostEqual(result.efektivni_stoupani, 6.0)
+
+        # Use case 2: Compound beats the best plain pair for a fine target
+        plain = self.dt.vyzkousej_kombinace(50.0, (), mm, 'mm')
+        result = self.dt.slozeny_zavit(50.0, (), mm)
+        self.assertLess(result.odchylka, abs(50.0 - plain[2]))
+        self.assertLessEqual(len(result.prvky), 3)
+
+        # Use case 3: Effective pitch matches its elements
+        posuv = sum(znamenko * chodu / stoupani for stoupani, chodu, znamenko in result.prvky)
+        self.assertAlmostEqual(result.efektivni_stoupani, 1 / abs(posuv))
+        self.assertAlmostEqual(result.odchylka, abs(50.0 - result.efektivni_stoupani))
+
+        # Use case 4: Elements use distinct pitches from the inventory
+        stoupani = [p[0] for p in result.prvky]
+        self.assertEqual(len(stoupani), len(set(stoupani)))
+        self.assertTrue(all(p in mm for p in stoupani))
+
+    def test_read_inventory_lines(self):
+        # Use case 1: Shipped DIFFTHRD.DAT without header, comments and blank lines
+        tpi, mm = self.dt.parse_data(read_inventory_lines(self.dt.data_file))
+        self.assertEqual(tpi[:3], (44.0, 40.0, 38.0))
+        self.assertIn(1.375, mm)
+        self.assertEqual(len(tpi), 21)
+
+    def test_pitch_inventory_reload(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        data_file = os.path.join(tmp_dir, 'DIFFTHRD.DAT')
+        shutil.copy(self.dt.data_file, data_file)
+
+        # Use case 1: One shared inventory per file, parsed once
+        inventory = get_inventory(data_file)
+        self.assertIs(get_inventory(data_file), inventory)
+        tpi, mm = inventory.get()
+        self.assertIs(inventory.get()[1], mm)
+        self.assertEqual(DifferentialThread(data_file).inventory(), (tpi, mm))
+
+        # Use case 2: Changed file is picked up without restart
+        with open(data_file) as f:
+            content = f.read()
+        with open(data_file, 'w') as f:
+            f.write(content.replace('0.3\n', '0.3\n0.25\n'))
+        stat = os.stat(data_file)
+        os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        tpi2, mm2 = inventory.get()
+        self.assertEqual(mm2, mm + (0.25,))
+        self.assertEqual(tpi2, tpi)
+
+    def test_naplanuj_pohyb(self):
+        # Use case 1: Single motion matches the interactive formulas
+        plan = self.dt.naplanuj_pohyb(2.0, 1.5, 15, 4, 2)[0]
+        self.assertAlmostEqual(plan.posuv_na_otacku, 1 / 6.0)
+        self.assertAlmostEqual(plan.otacky, 90.0)
+        self.assertAlmostEqual(plan.delka_hrubeho, 4 + 90.0 / 1.5)
+        self.assertAlmostEqual(plan.delka_jemneho, 2 + 90.0 / 2.0)
+        self.assertAlmostEqual(plan.max_vzdalenost, 45.0)
+        self.assertAlmostEqual(plan.min_vzdalenost, 60.0)
+
+        # Use case 2: Batch of motions with per-row nut thickness
+        plany = self.dt.naplanuj_pohyb(2.0, 1.5, [5, 10, 20], 4, [2, 3, 4])
+        self.assertEqual(len(plany), 3)
+        self.assertEqual([p.jemna_matka for p in plany], [2, 3, 4])
+        self.assertAlmostEqual(plany[2].otacky, 120.0)
+
+        # Use case 3: Mismatched lengths
+        with self.assertRaises(ValueError):
+            self.dt.naplanuj_pohyb(2.0, 1.5, [5, 10], 4, [2, 3, 4])
+
+        # Use case 4: Numbers given as text are single values, not sequences
+        plany = self.dt.naplanuj_pohyb(2.0, 1.5, [5, 10], '10', ['2', '3'])
+        self.assertEqual([p.hruba_matka for p in plany], [10.0, 10.0])
+        self.assertEqual([p.jemna_matka for p in plany], [2.0, 3.0])
+        with self.assertRaises(ValueError):
+            self.dt.naplanuj_pohyb(2.0, 1.5, 15, 'abc', 2)
+
+    def test_calculate_diff_thread_array(self):
+        # Use case 1: Same values as the scalar version
+        result = list(calculate_diff_thread_array([2.0, 3.0, 4.0], [1.5, 2.5, 1.5]))
+        for pe, (c, f) in zip(result, [(2.0, 1.5), (3.0, 2.5), (4.0, 1.5)]):
+            self.assertEqual(pe, calculate_diff_thread(c, f))
+
+        # Use case 2: Invalid pairs are masked instead of raising
+        result = list(calculate_diff_thread_array([0, 2.0, 1.0], [1.5, 2.0, 0]))
+        self.assertTrue(all(math.isnan(pe) for pe in result))
+
+        # Use case 3: Scalar against an array
+        result = list(calculate_diff_thread_array(2.0, [1.5, 1.0]))
+        self.assertAlmostEqual(result[0], 6.0)
+        self.assertAlmostEqual(result[1], 2.0)
+
+        # Use case 4: Full inventory matrix
+        matrix = pitch_matrix((1.0, 1.5, 2.0))
+        self.assertTrue(math.isnan(matrix[1][1]))
+        self.assertAlmostEqual(matrix[2][1], 6.0)
+        self.assertAlmostEqual(matrix[1][2], 6.0)
+
     def test_calculate_diff_thread_function(self):
         # Use case 1: Original test
         result = calculate_diff_thread(2.0, 1.5)
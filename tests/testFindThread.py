@@ -8,8 +8,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
 Unit tests for findThread module.
 """
 
+import math
 import unittest
-from findThread import Thread, ThreadPool
+import shutil
+import tempfile
+from collections.abc import Sequence
+from unittest import mock
+from findThread import Thread, ThreadPool, ThreadCatalog, get_catalog, load_catalog, compile_catalog, \
+    ThreadKDTree, PrefixTrie, thread_family, cache_path, import_catalog, iter_rows, read_data_file, \
+    extract_thread, __FILE__ as DATA_FILE
 
 
 class TestFindThread(unittest.TestCase):
@@ -143,5 +150,290 @@ class TestFindThread(unittest.TestCase):
         self.assertFalse(inch_thread_1_2.is_metric())
 
 
+class TestThreadCatalog(unittest.TestCase):
+
+    def test_pools_share_catalog(self):
+        prvni = ThreadPool()
+        druhy = ThreadPool()
+        self.assertIs(prvni.catalog, druhy.catalog)
+        self.assertIs(prvni.threadBin, druhy.threadBin)
+        self.assertIsInstance(prvni.threadBin, Sequence)
+        self.assertEqual(len(prvni.catalog), len(prvni.threadBin))
+
+    def test_catalog_matches_parsing(self):
+        pool = ThreadPool()
+        seznam, typy = pool.read_up_data()
+        self.assertEqual([t.name for t in seznam], [t.name for t in pool.threadBin])
+        self.assertEqual(tuple(typy), pool.threadData)
+        self.assertEqual(pool.threadBin[0].name, 'M14 Coarse')
+
+    def test_catalog_reloads_changed_file(self):
+        adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, adresar)
+        cesta = os.path.join(adresar, 'FINDTHRD.DAT')
+        shutil.copy(DATA_FILE, cesta)
+        katalog = get_catalog(cesta)
+        self.assertIs(get_catalog(cesta), katalog)
+        with open(cesta) as f:
+            obsah = f.read()
+        with open(cesta, 'w') as f:
+            f.write(obsah.replace('ENDOFDATA', 'M99 Test    3.8976  99      4.233  6.0\nENDOFDATA', 1))
+        novy = get_catalog(cesta)
+        self.assertIsNot(novy, katalog)
+        self.assertEqual(len(novy), len(katalog) + 1)
+        self.assertEqual(novy.threads[-1].name, 'M99 Test')
+        self.assertEqual(novy.threads[-1].pitchMM, 6.0)
+
+    def test_search_exact_uses_index(self):
+        pool = ThreadPool()
+        nalez = pool.search_threads(10.0, 'mm', 'diameter')
+        ocekavano = [t for t in pool.threadBin if t.diaMM == 10.0]
+        self.assertEqual(nalez, ocekavano)
+        self.assertIn('M10 Coarse', [t.name for t in nalez])
+
+    def test_search_tolerance(self):
+        pool = ThreadPool()
+        self.assertEqual(pool.search_threads(9.98, 'mm', 'diameter'), [])
+        nalez = pool.search_threads(9.98, 'mm', 'diameter', tolerance=0.05)
+        self.assertEqual(nalez, [t for t in pool.threadBin
+                                 if t.diaMM != 'N/A' and abs(t.diaMM - 9.98) <= 0.05])
+        self.assertIn('M10 Fine', [t.name for t in nalez])
+        self.assertIn('1/4 UNC', [t.name for t in pool.search_threads(19.9, 'tpi', 'pitch', 0.15)])
+
+    def test_search_range(self):
+        pool = ThreadPool()
+        nalez = pool.search_range(0.5, 1.0, 'mm', 'pitch')
+        self.assertEqual(nalez, [t for t in pool.threadBin if 0.5 <= t.pitchMM <= 1.0])
+        self.assertEqual(pool.search_range(1.0, 0.5), [])
+
+    def test_search_invalid(self):
+        with self.assertRaises(ValueError):
+            ThreadPool().search_threads(1.0, 'in', 'core')
+
+    def test_columns(self):
+        katalog = get_catalog()
+        self.assertEqual(len(katalog.columns['diaMM']), len(katalog))
+        self.assertAlmostEqual(katalog.columns['coreMM'][0], 11.508)    # '11,508' v souboru
+        self.assertTrue(math.isnan(katalog.columns['coreMM'][katalog.names.index('25 THURY')]))
+        for t, prumer in zip(katalog.threads, katalog.columns['diaMM']):
+            self.assertEqual(t.diaMM, prumer)
+
+    def test_compound_filter(self):
+        pool = ThreadPool()
+        katalog = pool.catalog
+        nalez = pool.filter(metric=True, pitchMM=(0.5, 1.0), coreMM=(5, None))
+        ocekavano = [t for i, t in enumerate(pool.threadBin)
+                     if t.is_metric() and 0.5 <= t.pitchMM <= 1.0 and katalog.columns['coreMM'][i] > 5]
+        self.assertEqual(nalez, ocekavano)
+        self.assertIn('M8 Fine', [t.name for t in nalez])
+        self.assertEqual(len(pool.filter()), len(katalog))
+        self.assertEqual(len(pool.filter(metric=False)) + len(pool.filter(metric=True)), len(katalog))
+        with self.assertRaises(ValueError):
+            katalog.mask(name=(1, 2))
+
+    def test_compiled_catalog(self):
+        adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, adresar)
+        cesta = os.path.join(adresar, 'FINDTHRD.DAT')
+        shutil.copy(DATA_FILE, cesta)
+        self.assertEqual(compile_catalog(cesta), cache_path(cesta))
+        zdroj = ThreadCatalog.from_file(cesta)
+        mapovany = ThreadCatalog.load_cache(cache_path(cesta), zdroj.signature)
+        self.assertIsNotNone(mapovany)
+        self.assertEqual(mapovany.names, zdroj.names)
+        self.assertEqual(mapovany.types, zdroj.types)
+        self.assertEqual(list(mapovany.columns['pitchMM']), list(zdroj.columns['pitchMM']))
+        self.assertEqual(mapovany.select(metric=True, pitchMM=(0.5, 1.0)), zdroj.select(metric=True, pitchMM=(0.5, 1.0)))
+        pool = ThreadPool(mapovany)
+        self.assertEqual([t.name for t in pool.search_threads(10.0, 'mm', 'diameter')],
+                         [t.name for t in ThreadPool(zdroj).search_threads(10.0, 'mm', 'diameter')])
+
+        # nalez z nacteneho katalogu sestavi jen nalezene radky, ostatni se neparsuji
+        mapovany = ThreadCatalog.load_cache(cache_path(cesta), zdroj.signature)
+        with mock.patch('findThread.extract_thread', wraps=extract_thread) as parsovani:
+            nalez = ThreadPool(mapovany).search_threads(10.0, 'mm', 'diameter')
+        self.assertEqual(parsovani.call_count, len(nalez))
+        self.assertEqual([vars(t) for t in mapovany.threads], [vars(t) for t in zdroj.threads])
+
+    def test_stale_compiled_catalog(self):
+        adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, adresar)
+        cesta = os.path.join(adresar, 'FINDTHRD.DAT')
+        shutil.copy(DATA_FILE, cesta)
+        pocet = len(load_catalog(cesta))
+        self.assertTrue(os.path.exists(cache_path(cesta)))
+        with open(cesta, 'a') as f:
+            f.write(' ')
+        podpis = (os.stat(cesta).st_mtime_ns, os.stat(cesta).st_size)
+        self.assertIsNone(ThreadCatalog.load_cache(cache_path(cesta), podpis))
+        katalog = load_catalog(cesta)
+        self.assertEqual(len(katalog), pocet)
+        self.assertEqual(katalog.signature, podpis)
+        self.assertIsNotNone(ThreadCatalog.load_cache(cache_path(cesta), katalog.signature))
+
+    def test_corrupt_compiled_catalog(self):
+        adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, adresar)
+        cesta = os.path.join(adresar, 'FINDTHRD.DAT')
+        shutil.copy(DATA_FILE, cesta)
+        pocet = len(load_catalog(cesta))
+        with open(cache_path(cesta), 'rb') as f:
+            data = f.read()
+        for delka in (len(data) - 1, 1001, 100, 3):
+            with open(cache_path(cesta), 'wb') as f:
+                f.write(data[:delka])
+            katalog = load_catalog(cesta)
+            self.assertEqual(len(katalog), pocet)
+        self.assertIsNotNone(ThreadCatalog.load_cache(cache_path(cesta), katalog.signature))
+        self.assertEqual(sorted(os.listdir(adresar)), ['FINDTHRD.DAT', os.path.basename(cache_path(cesta))])
+
+    def test_identify_metric(self):
+        pool = ThreadPool()
+        nalez = pool.identify(9.9, 1.5, 'mm', k=5)
+        self.assertEqual(len(nalez), 5)
+        self.assertIn('M10 Coarse', [m.thread.name for m in nalez[:2]])
+        self.assertEqual([m.vzdalenost for m in nalez], sorted(m.vzdalenost for m in nalez))
+        m10 = [m for m in nalez if m.thread.name == 'M10 Coarse'][0]
+        self.assertAlmostEqual(m10.vzdalenost, 0.5)
+        self.assertAlmostEqual(m10.odchylka_prumeru, -0.1)
+        self.assertTrue(m10.v_toleranci)
+
+    def test_identify_inch(self):
+        nalez = ThreadPool().identify(0.248, 20, 'in', k=2)
+        self.assertEqual(sorted(m.thread.name for m in nalez), ['1/4 UNC', '1/4 WHIT'])
+        self.assertTrue(all(m.v_toleranci for m in nalez))
+        with self.assertRaises(ValueError):
+            ThreadPool().identify(0.25, 20, 'ft')
+        with self.assertRaises(ValueError):
+            ThreadPool().identify(6, 1, 'mm', tolerance_prumeru=0)
+
+    def test_kdtree_matches_brute_force(self):
+        import random
+        nahoda = random.Random(7)
+        body = [(nahoda.uniform(0, 50), nahoda.uniform(0.2, 5), i) for i in range(300)]
+        strom = ThreadKDTree(body)
+        for _ in range(200):
+            d, p = nahoda.uniform(0, 50), nahoda.uniform(0.2, 5)
+            vahy = (1 / nahoda.uniform(0.05, 1), 1 / nahoda.uniform(0.01, 0.5))
+            ocekavano = sorted((math.hypot((b[0] - d) * vahy[0], (b[1] - p) * vahy[1]), b[2]) for b in body)[:4]
+            self.assertEqual([i for _, i in strom.nearest(d, p, 4, vahy)], [i for _, i in ocekavano])
+        self.assertEqual(strom.nearest(1, 1, 0), [])
+        self.assertEqual(ThreadKDTree([]).nearest(1, 1, 3), [])
+
+    def test_families(self):
+        pool = ThreadPool()
+        katalog = pool.catalog
+        metric = pool.list_metric_threads()
+        self.assertEqual(metric, tuple(t for t in pool.threadBin if t.is_metric() and 'HOLTZ' not in t.name))
+        self.assertIs(metric, pool.list_metric_threads())
+        self.assertEqual(pool.filter(metric=True), list(metric))
+        self.assertNotIn('M HOLTZ', [t.name for t in pool.filter(metric=True)])
+        for zdroj in (ThreadCatalog.from_file(DATA_FILE), import_catalog(DATA_FILE)):
+            self.assertEqual(zdroj.select(metric=True), list(zdroj.families['M']))
+        self.assertIn('M HOLTZ', [t.name for t in pool.list_family('HOLTZ')])
+        self.assertEqual(len(pool.list_family('BA')), len([t for t in pool.threadBin if t.name.endswith('BA')]))
+        self.assertEqual(pool.families()['Whit'], 'Whitworth')
+        self.assertEqual(sum(len(p) for p in katalog.families.values()), len(katalog))
+        self.assertEqual(pool.list_family('XYZ'), ())
+
+    def test_thread_family(self):
+        legenda = get_catalog().legend
+        self.assertEqual(legenda['UNC'], 'Unified National Fine/Coarse')
+        self.assertEqual(thread_family('1/4 UNC', legenda), 'UNC')
+        self.assertEqual(thread_family('10 W.INS', legenda), 'WINS')
+        self.assertEqual(thread_family('7/16 CEI20', legenda), 'CEI')
+        self.assertEqual(thread_family('2BA', legenda), 'BA')
+        self.assertEqual(thread_family('1/4 WHIT', legenda), 'Whit')
+        self.assertEqual(thread_family('M10 Coarse', legenda), 'M')
+        self.assertEqual(thread_family('M HOLTZ', legenda), 'HOLTZ')
+        self.assertIsNone(thread_family('1 1/8', legenda))
+
+    def test_suggest(self):
+        pool = ThreadPool()
+        nazvy = [t.name for t in pool.suggest('1/4', limit=50)]
+        self.assertEqual(nazvy[:3], ['1/4 BRASS', '1/4 BSF', '1/4 CEI'])
+        self.assertTrue(all(n.startswith('1/4') or ' 1/4' in n for n in nazvy))
+        self.assertIn('1 1/4 BSF', nazvy)
+        self.assertEqual([t.name for t in pool.suggest('unc', 2)], ['4-40 UNC', '6-32 UNC'])
+        self.assertEqual(pool.suggest('zzz'), [])
+        trie = PrefixTrie(['M10 Coarse', 'Coarse M1', 'M1 Coarse'])
+        self.assertEqual(trie.suggest('m1'), [0, 2, 1])      # cele jmeno pred shodou slova
+        self.assertEqual(trie.suggest('coarse', 1), [1])
+
+
+class TestThreadImport(unittest.TestCase):
+
+    def setUp(self):
+        self.adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.adresar)
+
+    def soubor(self, jmeno, obsah):
+        cesta = os.path.join(self.adresar, jmeno)
+        with open(cesta, 'w') as f:
+            f.write(obsah)
+        return cesta
+
+    def test_read_data_file_markers(self):
+        typy, data = read_data_file(DATA_FILE)
+        self.assertEqual(typy[0], 'ADM = Admiralty\n')
+        self.assertEqual(typy[-1], '\n')
+        self.assertEqual(len(typy), 22)
+        self.assertTrue(data[0].startswith('M14 Coarse'))
+        self.assertFalse(any(radek.startswith(';') or not radek.strip() for radek in data))
+        vlastni = self.soubor('vlastni.dat', 'Email = nekdo@nekde\n\nX = Pokusny\n\nSTARTOFDATA\n'
+                                             ';komentar\nM99 Test    3.8976  99      4.233  6.0\nENDOFDATA\nM1\n')
+        typy, data = read_data_file(vlastni)
+        self.assertEqual(typy, ('X = Pokusny\n', '\n'))
+        self.assertEqual(len(data), 1)
+
+    def test_import_same_as_catalog(self):
+        importovany = import_catalog(DATA_FILE, chunk=17)
+        katalog = get_catalog()
+        self.assertEqual(importovany.names, katalog.names)
+        self.assertEqual(importovany.families, katalog.families)
+        self.assertEqual(list(importovany.columns['pitchMM']), list(katalog.columns['pitchMM']))
+        self.assertAlmostEqual(ThreadPool(importovany).threadBin[0].coreMM, 11.508)
+
+    def test_import_merge_csv_jsonl(self):
+        csv_soubor = self.soubor('vlastni.csv', 'name,diaMM,pitchMM,coreMM\n'
+                                                'M10 Coarse,10,1.5,8.16\n'
+                                                'Tr 20x4,20,4,\n'
+                                                'Tr 24x5,24,5,"18,5"\n')
+        jsonl_soubor = self.soubor('palcove.jsonl', '{"name": "3/8 ACME", "diaInch": 0.375, "pitchTPI": 12}\n'
+                                                    '\n'
+                                                    '{"name": "tr  20X4", "diaMM": 20, "pitchMM": 4}\n')
+        katalog = import_catalog(DATA_FILE, csv_soubor, jsonl_soubor, chunk=100)
+        self.assertEqual(len(katalog), len(get_catalog()) + 3)      # M10 Coarse a Tr 20x4 jsou duplicity
+        self.assertEqual(katalog.names[-3:], ('Tr 20x4', 'Tr 24x5', '3/8 ACME'))
+        pool = ThreadPool(katalog)
+        acme = pool.threadBin[-1]
+        self.assertAlmostEqual(acme.diaMM, 9.525)
+        self.assertAlmostEqual(acme.pitchMM, 25.4 / 12)
+        self.assertEqual(acme.coreMM, 'N/A')
+        self.assertEqual(pool.threadBin[-2].coreMM, 18.5)
+        self.assertEqual([t.name for t in pool.search_threads(5.0, 'mm', 'pitch')][-1], 'Tr 24x5')
+        self.assertEqual(katalog.types, get_catalog().types)
+
+    def test_import_validation(self):
+        zaporny = self.soubor('spatny.csv', 'name,diaMM,pitchMM\nM6,6,1\nM8,8,-1.25\n')
+        with self.assertRaises(ValueError) as chyba:
+            import_catalog(zaporny)
+        self.assertIn('spatny.csv:3', str(chyba.exception))
+        with self.assertRaises(ValueError):
+            import_catalog(self.soubor('bez_stoupani.jsonl', '{"name": "M6", "diaMM": 6}\n'))
+        with self.assertRaises(ValueError):
+            import_catalog(self.soubor('text.jsonl', '{"name": "M6", "diaMM": "sest", "pitchMM": 1}\n'))
+        with self.assertRaises(ValueError):
+            import_catalog(self.soubor('bez_jmena.csv', 'diaMM,pitchMM\n6,1\n'))
+        with self.assertRaises(ValueError):
+            list(iter_rows(DATA_FILE, 'xml'))
+
+    def test_import_is_lazy(self):
+        radky = iter_rows(DATA_FILE)
+        prvni = next(radky)
+        self.assertEqual(prvni[0], 'M14 Coarse')
+        self.assertEqual(prvni[4], 2.0)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -11,7 +11,15 @@ Unit tests for tappingDrills module.
 import unittest
 import tempfile
 import os
-from tappingDrills import TappingDrills, MetricThread
+import json
+import shutil
+from unittest import mock
+import findThread
+from tappingDrills import TappingDrills, MetricThread, DrillTable, RadekVrtaku, export_rows, mrizka_sil, \
+    Drill, DrillInventory, VrtakZeSkladu, metricke_vrtaky, palcove_vrtaky, nacti_vrtaky, skutecna_sila, \
+    standardni_sklad, sklad_z_parametru, DrillReport, drill_report, TVARY_ZAVITU, KOEFICIENT_METRICKY, \
+    CatalogDrillTable, catalog_drill_table, tvar_zavitu
+from findThread import ThreadCatalog, get_catalog, __FILE__ as DATA_FILE
 from findThread import Thread
 
 
@@ -179,5 +187,309 @@ class TestTappingDrills(unittest.TestCase):
             self.metric_thread.getDrill(-10)
 
 
+class TestDrillTable(unittest.TestCase):
+
+    def setUp(self):
+        self.threads = [Thread("M6", "N/A", 6.0, "N/A", 1.0), Thread("M8", "N/A", 8.0, "N/A", 1.25),
+                        Thread("M10", "N/A", 10.0, "N/A", 1.5)]
+
+    def test_matrix_matches_single(self):
+        sily = mrizka_sil(50, 90)
+        self.assertEqual(len(sily), 41)
+        tabulka = DrillTable.from_threads(self.threads, sily)
+        matice = tabulka.matrix()
+        self.assertEqual(len(matice), 3)
+        for t, radek in zip(self.threads, matice):
+            self.assertEqual(radek, tuple(MetricThread.countTapDrillSingle(t.diaMM, t.pitchMM, s) for s in sily))
+        self.assertEqual(tabulka.nazvy, ("M6", "M8", "M10"))
+
+    def test_lazy_columns(self):
+        tabulka = DrillTable.from_threads(self.threads)
+        self.assertEqual(tabulka._sloupce, {})
+        self.assertAlmostEqual(tabulka.drill(1, 75), 6.98, places=2)
+        self.assertEqual(list(tabulka._sloupce), [75])
+        self.assertIs(tabulka.column(75), tabulka.column(75))
+        self.assertEqual(len(tabulka.row(0)), 6)
+        self.assertAlmostEqual(tabulka.drill(2, 55), MetricThread.countTapDrillSingle(10.0, 1.5, 55))
+
+    def test_off_grid_strengths_not_cached(self):
+        tabulka = DrillTable.from_threads(self.threads, (75,))
+        for sila in range(21, 101):
+            self.assertEqual(tabulka.drill(1, sila), tabulka.column(sila)[1])
+        self.assertEqual(list(tabulka._sloupce), [75])
+        with self.assertRaises(ValueError):
+            tabulka.drill(0, 10)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            DrillTable([6.0], [1.0, 1.25])
+        with self.assertRaises(ValueError):
+            DrillTable([6.0], [1.0], (20, 60))
+        with self.assertRaises(ValueError):
+            DrillTable([6.0], [1.0]).drill(0, 101)
+
+    def test_metric_thread_vrtaky(self):
+        vrtaky = MetricThread(self.threads[0]).vrtaky
+        self.assertEqual(len(vrtaky), len(MetricThread.sily))
+        self.assertAlmostEqual(vrtaky[3], 5.19, places=2)
+
+    def test_generate_output(self):
+        vystup = tempfile.NamedTemporaryFile(delete=False)
+        vystup.close()
+        self.addCleanup(os.unlink, vystup.name)
+        TappingDrills(vystup.name).generate_output()
+        with open(vystup.name) as f:
+            obsah = f.read()
+        self.assertIn('M10 Coarse & 1.50', obsah)
+        self.assertNotIn('HOLTZ', obsah)
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.radky = [RadekVrtaku('M6 Coarse', 1.0, '4.917  ', (5.35, 5.19)),
+                      RadekVrtaku('M8 Fine', 1.0, 'N/A', (7.35, 7.19))]
+
+    def test_latex(self):
+        text = list(export_rows(self.radky, 'latex', (60, 75)))
+        self.assertIn('LaTeX', text[0])
+        self.assertEqual(text[1], 'M6 Coarse & 1.00 & 4.917   & 5.35 & 5.19\\\\\\\\\n')
+        self.assertEqual(len(text), 3)
+
+    def test_csv(self):
+        text = ''.join(export_rows(self.radky, 'csv', (60, 75)))
+        self.assertEqual(text, 'name,pitch_mm,core_mm,drill_60,drill_75\n'
+                               'M6 Coarse,1.0,4.917,5.35,5.19\n'
+                               'M8 Fine,1.0,,7.35,7.19\n')
+
+    def test_markdown(self):
+        text = list(export_rows(self.radky, 'markdown', (60, 75)))
+        self.assertTrue(text[0].startswith('| Zavit |'))
+        self.assertIn('|---|---|---|---|---|', text[0])
+        self.assertEqual(text[2], '| M8 Fine | 1.00 |  | 7.35 | 7.19 |\n')
+
+    def test_jsonl(self):
+        text = list(export_rows(self.radky, 'jsonl', (60, 75)))
+        self.assertEqual(len(text), 2)
+        zaznam = json.loads(text[0])
+        self.assertEqual(zaznam['drills'], {'60': 5.35, '75': 5.19})
+        self.assertEqual(zaznam['core_mm'], 4.917)
+        self.assertIsNone(json.loads(text[1])['core_mm'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(export_rows(self.radky, 'xls'))
+
+    def test_streaming(self):
+        proud = TappingDrills(format='jsonl', sily=mrizka_sil(50, 90, 10)).export()
+        prvni = json.loads(next(proud))
+        self.assertEqual(prvni['name'], 'M1 Coarse')
+        self.assertEqual(list(prvni['drills']), ['50', '60', '70', '80', '90'])
+
+    def test_generate_output_csv(self):
+        vystup = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
+        vystup.close()
+        self.addCleanup(os.unlink, vystup.name)
+        TappingDrills(vystup.name, format='csv').generate_output()
+        with open(vystup.name) as f:
+            radky = f.read().splitlines()
+        self.assertEqual(radky[0], 'name,pitch_mm,core_mm,drill_60,drill_65,drill_70,drill_75,drill_80,drill_85')
+        self.assertEqual(len(radky), 1 + len(list(TappingDrills().rows())))
+
+
+class TestDrillInventory(unittest.TestCase):
+
+    def test_standard_sizes(self):
+        metricke = metricke_vrtaky()
+        self.assertEqual(metricke[0].prumer, 0.3)
+        self.assertEqual(metricke[-1].prumer, 20.0)
+        self.assertIn(Drill('6.8', 6.8, 'metric'), metricke)
+        palcove = {v.oznaceni: v for v in palcove_vrtaky()}
+        self.assertAlmostEqual(palcove['#7'].prumer, 5.1054)
+        self.assertAlmostEqual(palcove['#80'].prumer, 0.3429)
+        self.assertAlmostEqual(palcove['F'].prumer, 6.5278)
+        self.assertAlmostEqual(palcove['17/64"'].prumer, 6.746875)
+        self.assertIn('1 1/16"', palcove)
+        self.assertEqual(len([v for v in palcove.values() if v.druh == 'letter']), 26)
+
+    def test_nearest(self):
+        sklad = DrillInventory([Drill('a', 5.0, 'shop'), Drill('c', 5.5, 'shop'), Drill('b', 5.2, 'shop')])
+        self.assertEqual([v.oznaceni for v in sklad.vrtaky], ['a', 'b', 'c'])
+        self.assertEqual(sklad.nearest(5.11).oznaceni, 'b')
+        self.assertEqual(sklad.nearest(5.09).oznaceni, 'a')
+        self.assertEqual(sklad.nearest(5.2).oznaceni, 'b')
+        self.assertEqual(sklad.nearest(5.19, 'down').oznaceni, 'a')
+        self.assertEqual(sklad.nearest(5.01, 'up').oznaceni, 'b')
+        self.assertIsNone(sklad.nearest(4.0, 'down'))
+        self.assertEqual(sklad.nearest(9.0).oznaceni, 'c')
+        with self.assertRaises(ValueError):
+            sklad.nearest(5.0, 'left')
+        with self.assertRaises(ValueError):
+            DrillInventory([Drill('x', 0, 'shop')])
+
+    def test_snap_engagement(self):
+        vyber = standardni_sklad(inch=False).snap(6.0, 1.0, 75)
+        self.assertEqual(vyber.vrtak.oznaceni, '5.2')
+        self.assertAlmostEqual(vyber.teoreticky, 5.18775)
+        self.assertAlmostEqual(vyber.sila, (6.0 - 5.2) * 100 / 1.083)
+        self.assertAlmostEqual(skutecna_sila(6.0, 1.0, MetricThread.countTapDrillSingle(6.0, 1.0, 70)), 70)
+        self.assertEqual(standardni_sklad(inch=False).snap(6.0, 1.0, 75, 'down').vrtak.oznaceni, '5.1')
+        self.assertIs(standardni_sklad(), standardni_sklad())
+
+    def test_shop_list(self):
+        adresar = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, adresar)
+        cesta = os.path.join(adresar, 'vrtaky.txt')
+        with open(cesta, 'w') as f:
+            f.write('; vrtaky v dilne\n5.2\nF 0.257 in\nstary 6,75\n\n')
+        vrtaky = nacti_vrtaky(cesta)
+        self.assertEqual([v.oznaceni for v in vrtaky], ['5.2', 'F', 'stary'])
+        self.assertAlmostEqual(vrtaky[1].prumer, 6.5278)
+        self.assertEqual(vrtaky[2].prumer, 6.75)
+        with open(cesta, 'a') as f:
+            f.write('x 5 ft\n')
+        with self.assertRaises(ValueError):
+            nacti_vrtaky(cesta)
+
+    def test_sklad_z_parametru(self):
+        self.assertIsNone(sklad_z_parametru(None))
+        self.assertIs(sklad_z_parametru('all'), standardni_sklad())
+        self.assertTrue(all(v.druh == 'metric' for v in sklad_z_parametru('metric').vrtaky))
+        vlastni = sklad_z_parametru([5.0, ['G', 6.6294]])
+        self.assertEqual([v.oznaceni for v in vlastni.vrtaky], ['5', 'G'])
+        with self.assertRaises(ValueError):
+            sklad_z_parametru('nekde')
+
+    def test_export_with_inventory(self):
+        td = TappingDrills(format='csv', sily=(75,), sklad=standardni_sklad(inch=False))
+        radky = list(td.export())
+        self.assertEqual(radky[0], 'name,pitch_mm,core_mm,drill_75,stock_75,engagement_75\n')
+        m6 = [r for r in radky if r.startswith('M6 Coarse,')][0]
+        self.assertIn(',5.2,73.9', m6)
+        radek = next(TappingDrills(sily=(75,), sklad=standardni_sklad()).rows())
+        self.assertIsInstance(radek.skladove[0], VrtakZeSkladu)
+        with self.assertRaises(ValueError):
+            TappingDrills(smer='left')
+
+
+class TestDrillReport(unittest.TestCase):
+
+    def test_join_matches_nearest(self):
+        sklad = standardni_sklad()
+        katalog = get_catalog()
+        for smer in (None, 'down', 'up'):
+            zprava = DrillReport(katalog, sklad, 75, smer)
+            self.assertEqual(len(zprava.radky), len(katalog))
+            for radek in zprava.radky:
+                self.assertEqual(radek.vrtak, sklad.nearest(radek.teoreticky, smer))
+
+    def test_all_families(self):
+        zprava = drill_report(get_catalog(), standardni_sklad(inch=False))
+        rodiny = zprava.by_family()
+        self.assertIn('UNC', rodiny)
+        self.assertIn('Whit', rodiny)
+        m6 = [r for r in rodiny['M'] if r.nazev == 'M6 Coarse'][0]
+        self.assertEqual(m6.vrtak.oznaceni, '5.2')
+        self.assertAlmostEqual(m6.sila, skutecna_sila(6.0, 1.0, 5.2))
+        self.assertEqual(sum(len(r) for r in rodiny.values()), len(zprava.radky))
+
+    def test_cached_regeneration(self):
+        self.assertIs(drill_report(), drill_report())
+        self.assertIsNot(drill_report(sila=70), drill_report())
+        katalog = ThreadCatalog.from_file(DATA_FILE)
+        self.assertIsNot(drill_report(katalog), drill_report())
+        vlastni = DrillInventory([Drill('5', 5.0, 'shop')])
+        zprava = drill_report(katalog, vlastni, 75, 'down')
+        self.assertTrue(all(r.vrtak is None or r.vrtak.oznaceni == '5' for r in zprava.radky))
+
+    def test_report_strengths_keep_shared_table(self):
+        tabulka = catalog_drill_table().tabulka
+        pocet = len(tabulka._sloupce)
+        for sila in (61.5, 62.5, 63.5):
+            drill_report(sila=sila)
+        self.assertEqual(len(tabulka._sloupce), pocet)
+
+    def test_default_follows_file_change(self):
+        with tempfile.TemporaryDirectory() as adresar:
+            soubor = os.path.join(adresar, 'FINDTHRD.DAT')
+            shutil.copyfile(DATA_FILE, soubor)
+            with mock.patch.object(findThread, '__FILE__', soubor):
+                puvodni = drill_report()
+                m10 = [r for r in puvodni.radky if r.nazev == 'M10 Coarse'][0]
+                self.assertEqual(m10.stoupani, 1.5)
+                with open(soubor) as f:
+                    text = f.read()
+                with open(soubor, 'w') as f:
+                    f.write(text.replace('M10 Coarse  0.3940  10.000  16.9   1.500',
+                                         'M10 Coarse  0.3940  10.000  16.9   1.250'))
+                nova = drill_report()
+                self.assertIsNot(nova, puvodni)
+                m10 = [r for r in nova.radky if r.nazev == 'M10 Coarse'][0]
+                self.assertEqual(m10.stoupani, 1.25)
+
+
+class TestThreadForms(unittest.TestCase):
+
+    def test_forms_by_family(self):
+        tabulka = catalog_drill_table()
+        self.assertIs(tabulka.tvary[tabulka.find('M6 Coarse')], TVARY_ZAVITU['ISO'])
+        self.assertIs(tabulka.tvary[tabulka.find('1/4 UNC')], TVARY_ZAVITU['ISO'])
+        self.assertIs(tabulka.tvary[tabulka.find('1/4 WHIT')], TVARY_ZAVITU['Whitworth'])
+        self.assertIs(tabulka.tvary[tabulka.find('2BA')], TVARY_ZAVITU['BA'])
+        self.assertEqual(TVARY_ZAVITU['Whitworth'].uhel, 55.0)
+
+    def test_catalog_depth_fallback(self):
+        katalog = get_catalog()
+        i = katalog.families['PROG'][0]
+        tvar = tvar_zavitu(katalog, i)
+        self.assertEqual(tvar.nazev, 'katalog')
+        self.assertAlmostEqual(tvar.koeficient, 2 * katalog.columns['depthMM'][i] / katalog.pitch_mm(i))
+
+    def test_drills(self):
+        tabulka = catalog_drill_table()
+        self.assertAlmostEqual(tabulka.drill('1/4 whit'), 6.35 - 1.27 * 1.2806 * 0.75, 2)
+        self.assertAlmostEqual(tabulka.drill(' m6   coarse ', 75), MetricThread(
+            Thread('M6', 'N/A', 6.0, 'N/A', 1.0, 'N/A', 'N/A', 'N/A', 'N/A')).getDrill(75))
+        with self.assertRaises(ValueError):
+            tabulka.find('no such thread')
+
+    def test_precomputed_and_shared(self):
+        katalog = ThreadCatalog.from_file(DATA_FILE)
+        tabulka = catalog_drill_table(katalog)
+        self.assertIs(tabulka, catalog_drill_table(katalog))
+        self.assertEqual(len(tabulka.tabulka._sloupce), len(tabulka.tabulka.sily))
+        self.assertIsInstance(CatalogDrillTable(katalog, (75,)).tabulka.column(75)[0], float)
+
+    def test_default_follows_file_change(self):
+        with tempfile.TemporaryDirectory() as adresar:
+            soubor = os.path.join(adresar, 'FINDTHRD.DAT')
+            shutil.copyfile(DATA_FILE, soubor)
+            with mock.patch.object(findThread, '__FILE__', soubor):
+                puvodni = catalog_drill_table()
+                self.assertIs(puvodni, catalog_drill_table())
+                self.assertEqual(puvodni.tabulka.stoupani[puvodni.find('M10 Coarse')], 1.5)
+                with open(soubor) as f:
+                    text = f.read()
+                with open(soubor, 'w') as f:
+                    f.write(text.replace('M10 Coarse  0.3940  10.000  16.9   1.500',
+                                         'M10 Coarse  0.3940  10.000  16.9   1.250'))
+                nova = catalog_drill_table()
+                self.assertIsNot(nova, puvodni)
+                self.assertEqual(nova.tabulka.stoupani[nova.find('M10 Coarse')], 1.25)
+
+    def test_coefficients_match_scalar(self):
+        jednotna = DrillTable([6.0, 8.0], [1.0, 1.25])
+        po_radcich = DrillTable([6.0, 8.0], [1.0, 1.25], koeficienty=[KOEFICIENT_METRICKY] * 2)
+        self.assertEqual(jednotna.matrix(), po_radcich.matrix())
+        with self.assertRaises(ValueError):
+            DrillTable([6.0], [1.0], koeficienty=[1.0, 1.0])
+
+    def test_family_export(self):
+        radky = list(TappingDrills(rodina='Whit', sily=(75,)).rows())
+        self.assertEqual(radky[0].nazev, '1/8 WHIT')
+        with self.assertRaises(ValueError):
+            TappingDrills(rodina='XYZ')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file